@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+'''
+Benchmark electrode hit-testing using :class:`dmf_device_ui.geometry.ShapeGrid`
+against ``ShapesCanvas.find_shape()`` on a synthetic device, and check that
+:class:`dmf_device_ui.geometry.LabelImage` agrees with
+:meth:`ShapeGrid.find_shape` to within a pixel.
+
+.. versionadded:: 0.16
+'''
+import logging
+import sys
+import time
+
+from svg_model.shapes_canvas import ShapesCanvas
+import numpy as np
+import pandas as pd
+
+from ..geometry import LabelImage, ShapeGeometry, ShapeGrid
+
+logger = logging.getLogger(__name__)
+
+
+def synthetic_shapes(electrode_count=5000, columns=100, size=10., gap=1.):
+    '''
+    Parameters
+    ----------
+    electrode_count : int, optional
+        Number of electrodes.
+    columns : int, optional
+        Number of electrodes per row.
+    size : float, optional
+        Width and height of each electrode.
+    gap : float, optional
+        Spacing between neighbouring electrodes.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Table with one row per electrode vertex, with the columns ``id``,
+        ``vertex_i``, ``x``, and ``y``.
+    '''
+    i = np.arange(electrode_count)
+    x = (i % columns) * (size + gap)
+    y = (i // columns) * (size + gap)
+    # Octagon vertices (relative to electrode top-left corner).
+    corner = .25 * size
+    dx = np.array([corner, size - corner, size, size, size - corner, corner,
+                   0, 0])
+    dy = np.array([0, 0, corner, size - corner, size, size, size - corner,
+                   corner])
+    return pd.DataFrame({'id': np.repeat(['electrode%05d' % j for j in i],
+                                         dx.shape[0]),
+                         'vertex_i': np.tile(np.arange(dx.shape[0]),
+                                             electrode_count),
+                         'x': (x[:, None] + dx).ravel(),
+                         'y': (y[:, None] + dy).ravel()},
+                        columns=['id', 'vertex_i', 'x', 'y'])
+
+
+def label_agreement(label_image, shape_index, points):
+    '''
+    Parameters
+    ----------
+    label_image : LabelImage
+    shape_index : ShapeGrid
+    points : list
+        ``(x, y)`` point coordinates.
+
+    Returns
+    -------
+    float
+        Fraction of points for which the shape found by ``shape_index`` (or
+        background) covers the pixel containing the point *or* one of its
+        neighbouring pixels (i.e., shapes agree to within a pixel).
+    '''
+    agree = 0
+    for x, y in points:
+        i = shape_index.find_shape_index(x, y)
+        column, row = int(np.floor(x)), int(np.floor(y))
+        agree += any(label_image.lookup(column + dx, row + dy) == i
+                     for dx in (-1, 0, 1) for dy in (-1, 0, 1))
+    return agree / float(len(points))
+
+
+def benchmark(electrode_count=5000, point_count=10000, width=1920,
+              height=1080, seed=0):
+    '''
+    Returns
+    -------
+    pandas.Series
+        Mean lookup time (in seconds) using the existing
+        ``ShapesCanvas.find_shape()`` and using :class:`ShapeGrid`, the grid
+        build time, the fraction of points for which both methods agree, the
+        label image build time and memory (in bytes), and the fraction of
+        points for which the label image agrees with :class:`ShapeGrid` (see
+        :func:`label_agreement`).
+    '''
+    df_shapes = synthetic_shapes(electrode_count)
+    canvas = ShapesCanvas(df_shapes, 'id',
+                          canvas_shape=pd.Series([width, height],
+                                                 index=['width', 'height']))
+
+    geometry = ShapeGeometry.from_frame(canvas.df_canvas_shapes, 'id')
+    start = time.time()
+    shape_index = ShapeGrid(geometry)
+    build_duration = time.time() - start
+
+    start = time.time()
+    label_image = LabelImage(geometry, width, height)
+    label_build_duration = time.time() - start
+
+    points = np.random.RandomState(seed).rand(point_count, 2) * [width,
+                                                                 height]
+    points = points.tolist()
+
+    results = {}
+    durations = {}
+    for name, find_shape in (('canvas', canvas.find_shape),
+                             ('grid', shape_index.find_shape)):
+        start = time.time()
+        results[name] = [find_shape(x, y) for x, y in points]
+        durations[name] = (time.time() - start) / point_count
+
+    agreement = np.mean([a == b for a, b in zip(results['canvas'],
+                                                 results['grid'])])
+    return pd.Series([durations['canvas'], durations['grid'], build_duration,
+                      agreement, label_build_duration, label_image.nbytes,
+                      label_agreement(label_image, shape_index, points)],
+                     index=['canvas_lookup_s', 'grid_lookup_s',
+                            'grid_build_s', 'agreement', 'label_build_s',
+                            'label_bytes', 'label_agreement'])
+
+
+def parse_args(args=None):
+    '''Parses arguments, returns (options, args).'''
+    from argparse import ArgumentParser
+
+    if args is None:
+        args = sys.argv[1:]
+
+    parser = ArgumentParser(description='Benchmark electrode hit-testing on '
+                            'a synthetic device.')
+    parser.add_argument('-n', '--electrode-count', type=int, default=5000)
+    parser.add_argument('-p', '--point-count', type=int, default=10000)
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+
+    return parser.parse_args(args)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+
+    args = parse_args()
+    print benchmark(args.electrode_count, args.point_count, args.width,
+                    args.height)
+
+
+if __name__ == '__main__':
+    main()
@@ -26,6 +26,22 @@ def parse_args(args=None):
     parser.add_argument('--connections-alpha', type=float, default=.5)
     parser.add_argument('--connections-width', type=float, default=1)
     parser.add_argument('-n', '--plugin-name', default=None)
+    parser.add_argument('--render-workers', type=int, default=0,
+                        help='Number of threads used to render canvas layers '
+                        '(default: render on GUI thread).')
+    parser.add_argument('--decoder-queue-size', type=int, default=0,
+                        help='Decode hub messages in a background thread, '
+                        'queueing at most this many decoded messages '
+                        '(default: decode on GUI thread).')
+    parser.add_argument('--decoder-overflow', default='drop_stale',
+                        choices=['drop_stale', 'drop_oldest', 'block'],
+                        help='Action taken when decoded message queue is '
+                        'full (default: %(default)s).')
+    parser.add_argument('--state-format', default='json',
+                        choices=['json', 'bitmask', 'uint8'],
+                        help='Electrode state format requested from '
+                        'electrode controller; falls back to JSON if not '
+                        'supported (default: %(default)s).')
     parser.add_argument('-a', '--allocation', default=None,
                         help='Window allocation: x, y, width, height (JSON'
                         'object)')
@@ -57,19 +73,19 @@ def main():
     canvas = DmfDeviceCanvas(connections_color=args.connections_color,
                              connections_alpha=args.connections_alpha,
                              padding_fraction=args.padding_fraction,
+                             render_workers=args.render_workers,
                              width=480, height=240)
     canvas.connections_attrs['line_width'] = args.connections_width
 
+    view_kwargs = {'hub_uri': args.hub_uri, 'plugin_name': args.plugin_name,
+                   'allocation': allocation, 'debug_view': args.debug,
+                   'decoder_queue_size': args.decoder_queue_size,
+                   'decoder_overflow': args.decoder_overflow,
+                   'state_format': args.state_format}
     if args.command == 'fixed':
-        view = DmfDeviceFixedHubView(canvas, hub_uri=args.hub_uri,
-                                     plugin_name=args.plugin_name,
-                                     allocation=allocation,
-                                     debug_view=args.debug)
+        view = DmfDeviceFixedHubView(canvas, **view_kwargs)
     elif args.command == 'configurable':
-        view = DmfDeviceConfigurableHubView(canvas, hub_uri=args.hub_uri,
-                                            plugin_name=args.plugin_name,
-                                            allocation=allocation,
-                                            debug_view=args.debug)
+        view = DmfDeviceConfigurableHubView(canvas, **view_kwargs)
 
     view.widget.connect('destroy', gtk.main_quit)
 
@@ -1,24 +1,29 @@
 # -*- coding: utf-8 -*-
-from collections import OrderedDict
-import itertools
+from collections import Counter, OrderedDict
 import functools as ft
 import logging
 import threading
+import time
 
-from cairo_helpers.surface import flatten_surfaces
 from logging_helpers import _L
 from pygtkhelpers.ui.views.shapes_canvas_view import GtkShapesCanvasView
 from pygtkhelpers.utils import gsignal
 from pygst_utils.video_view.video_sink import VideoSink
 from pygst_utils.video_view import np_to_cairo
-from svg_model import compute_shape_centers
 from svg_model.color import hex_color_to_rgba
 import cairo
 import debounce
+import gobject
 import gtk
 import numpy as np
 import pandas as pd
 
+from .executor import RenderExecutor
+from .geometry import (LabelImage, ShapeGeometry, ShapeGrid, crop_surface,
+                       get_content_bbox)
+from .states import ElectrodeStates
+from .topology import PathCache, get_neighbours, walk_predecessors
+
 logger = logging.getLogger(__name__)
 
 
@@ -32,10 +37,22 @@ class Route(object):
 
         Represents an actuation sequence of electrodes that would support
         liquid movement between the first and last electrode.
+    neighbours : dict
+        Mapping from each electrode identifier to a :class:`frozenset` of
+        connected electrode identifiers (see
+        :func:`dmf_device_ui.topology.get_neighbours`).
+
+
+    .. versionchanged:: 0.16
+        Add ``neighbours`` argument.  If not specified, neighbours are
+        computed from ``device.df_shape_connections``.
     '''
-    def __init__(self, device):
+    def __init__(self, device, neighbours=None):
         self.device = device
         self.electrode_ids = []
+        if neighbours is None:
+            neighbours = get_neighbours(device.df_shape_connections)
+        self.neighbours = neighbours
 
     def __str__(self):
         return '<Route electrode_ids=%s>' % self.electrode_ids
@@ -51,25 +68,24 @@ class Route(object):
         ----------
         electrode_id : str
             Electrode identifier.
-        '''
-        do_append = False
 
+        Returns
+        -------
+        bool
+            ``True`` if electrode was appended to route.
+
+
+        .. versionchanged:: 0.16
+            Look up connection in :attr:`neighbours` (constant time), rather
+            than in device adjacency matrix.
+        '''
         if not self.electrode_ids:
             do_append = True
-        elif self.device.shape_indexes.shape[0] > 0:
+        else:
+            # Append target to current route only if it is connected to the
+            # last electrode in the route.
             source = self.electrode_ids[-1]
-            target = electrode_id
-            if not (source == target):
-                source_id, target_id = self.device.shape_indexes[[source,
-                                                                  target]]
-                try:
-                    if self.device.adjacency_matrix[source_id, target_id]:
-                        # Electrodes are connected, so append target to current
-                        # route.
-                        do_append = True
-                except IndexError:
-                    logger.warning('Electrodes `%s` and `%s` are not '
-                                   'connected.', source, target)
+            do_append = electrode_id in self.neighbours.get(source, ())
 
         if do_append:
             self.electrode_ids.append(electrode_id)
@@ -116,8 +132,72 @@ class DmfDeviceCanvas(GtkShapesCanvasView):
     gsignal('video-enabled')
     gsignal('video-disabled')
 
+    #: .. versionadded:: 0.16
+    #:
+    #: Inputs each rendered layer depends on.  A layer is only rebuilt (see
+    #: :meth:`update_layers`) after one of its inputs is invalidated (see
+    #: :meth:`invalidate`).
+    layer_dependencies = OrderedDict([('background', ('canvas_shape', )),
+                                      ('shapes', ('device', 'canvas_shape',
+                                                  'video_enabled')),
+                                      ('connections', ('device',
+                                                       'canvas_shape')),
+                                      ('routes', ('device', 'canvas_shape',
+                                                  'df_routes')),
+                                      ('temporary_route',
+                                       ('device', 'canvas_shape',
+                                        'temporary_route')),
+                                      ('channel_labels', ('device',
+                                                          'canvas_shape')),
+                                      ('static_electrode_state_shapes',
+                                       ('device', 'canvas_shape',
+                                        'electrode_states')),
+                                      ('dynamic_electrode_state_shapes',
+                                       ('device', 'canvas_shape',
+                                        'dynamic_electrodes')),
+                                      ('registration', ('canvas_shape',
+                                                        'corners'))])
+    #: .. versionadded:: 0.16
+    #:     Layers rendered by :attr:`render_executor` (if enabled).
+    #:
+    #:     Note that ``channel_labels`` is rendered on the GTK main loop,
+    #:     since ``render_labels()`` reads canvas state that cannot be
+    #:     snapshotted (see :attr:`render_inputs`).
+    async_layers = ('shapes', 'connections', 'routes')
+    #: .. versionadded:: 0.16
+    #:     Canvas attributes read by each of the :attr:`async_layers`.
+    #:     Attributes are captured on the GTK main loop when a render job is
+    #:     submitted (see :meth:`submit_layer`), so render workers never read
+    #:     state that is replaced in the meantime (e.g., by
+    #:     :meth:`set_device`).
+    render_inputs = {'shapes': ('shape_geometry', 'electrode_channels',
+                                'enabled'),
+                     'connections': ('connection_coords',
+                                     'connection_labels'),
+                     'routes': ('shape_geometry', 'shape_degrees',
+                                'df_routes')}
+    #: .. versionadded:: 0.16
+    #:     Storage format of layers that are not stored as full canvas
+    #:     ``FORMAT_ARGB32`` surfaces (see :meth:`compact_layer`):
+    #:
+    #:      - ``'mask'``: ``FORMAT_A8`` alpha mask, tinted with
+    #:        :attr:`layer_tints` color when composited.
+    #:      - ``'cropped'``: ``FORMAT_ARGB32`` surface cropped to content
+    #:        bounding box.
+    #:      - ``'cropped_mask'``: ``FORMAT_A8`` alpha mask cropped to content
+    #:        bounding box.
+    layer_formats = {'connections': 'mask', 'routes': 'cropped',
+                     'registration': 'cropped_mask'}
+
     def __init__(self, connections_alpha=1., connections_color=1.,
-                 transport='tcp', target_host='*', port=None, **kwargs):
+                 transport='tcp', target_host='*', port=None,
+                 render_workers=0, **kwargs):
+        '''
+        .. versionchanged:: 0.16
+            Add ``render_workers`` argument.  If greater than zero, render
+            :attr:`async_layers` using a pool of ``render_workers`` threads
+            (see :attr:`render_executor`).
+        '''
         # Video sink socket info.
         self.socket_info = {'transport': transport,
                             'host': target_host,
@@ -141,10 +221,56 @@ class DmfDeviceCanvas(GtkShapesCanvasView):
 
         self.mode = 'control'
 
+        #: .. versionadded:: 0.16
+        #:     Version of each render input (see :meth:`invalidate`).
+        self._input_versions = Counter()
+        #: .. versionadded:: 0.16
+        #:     Input versions each layer was last rendered from.
+        self._layer_input_versions = {}
+        #: .. versionadded:: 0.16
+        #:     Number of times each layer has been rendered.
+        self.layer_render_counts = Counter()
+
         # Read SVG polygons into dataframe, one row per polygon vertex.
         df_shapes = pd.DataFrame(None, columns=['id', 'vertex_i', 'x', 'y'])
         self.device = None
         self.shape_i_column = 'id'
+        #: .. versionadded:: 0.16
+        #:     Precompiled electrode geometry in device (i.e., shape)
+        #:     coordinates (see :meth:`set_device`).
+        self.device_geometry = None
+        #: .. versionadded:: 0.16
+        #:     Precompiled electrode geometry in canvas coordinates (see
+        #:     :meth:`reset_canvas`).
+        self.shape_geometry = None
+        #: .. versionadded:: 0.16
+        #:     ``(n_connections, 2)`` array of positions (in
+        #:     :attr:`device_geometry`) of source and target electrodes of each
+        #:     connection.
+        self.connection_indexes = None
+        #: .. versionadded:: 0.16
+        #:     Labels of connections in :attr:`connection_indexes` (i.e.,
+        #:     ``device.df_shape_connections`` index).
+        self.connection_labels = None
+        #: .. versionadded:: 0.16
+        #:     ``(n_connections, 4)`` array of canvas coordinates of connection
+        #:     endpoints (i.e., source x, source y, target x, target y).
+        self.connection_coords = None
+        #: .. versionadded:: 0.16
+        #:     Number of connections of each electrode, in
+        #:     :attr:`shape_geometry` order.
+        self.shape_degrees = None
+        #: .. versionadded:: 0.16
+        #:     Spatial index of electrodes in canvas coordinates (see
+        #:     :meth:`find_shape`).
+        self.shape_index = None
+        #: .. versionadded:: 0.16
+        #:     Mapping from each electrode identifier to a :class:`frozenset`
+        #:     of connected electrode identifiers (see :meth:`set_device`).
+        self.electrode_neighbours = {}
+        #: .. versionadded:: 0.16
+        #:     Shortest paths between electrodes (see :meth:`set_device`).
+        self.path_cache = None
 
         # Save alpha for drawing connections.
         self.connections_alpha = connections_alpha
@@ -154,6 +280,17 @@ class DmfDeviceCanvas(GtkShapesCanvasView):
 
         #: ..versionadded:: 0.12
         self._dynamic_electrodes = pd.Series()
+        #: .. versionadded:: 0.16
+        #:     Repaint only electrodes with changed states in
+        #:     :meth:`set_electrode_states` (rather than the whole layer).
+        self.incremental_electrode_states = True
+        #: .. versionadded:: 0.16
+        #:     Engine used to draw electrode state layers; either ``'cairo'``
+        #:     (fill Cairo paths) or ``'raster'`` (gather colors from label
+        #:     image).  See :meth:`render_electrode_shapes`.
+        self.electrode_shapes_engine = 'cairo'
+        # Electrode label images, keyed by shape scale and image size.
+        self._label_images = {}
         self.reset_states()
         self.reset_routes()
 
@@ -161,6 +298,14 @@ class DmfDeviceCanvas(GtkShapesCanvasView):
         self.last_pressed = None
         self.last_hovered = None
         self._route = None
+        #: .. versionadded:: 0.16
+        #:     Shortest path predecessor tree rooted at pressed electrode
+        #:     (see :meth:`get_route_tree`).
+        self._route_tree = None
+        #: .. versionadded:: 0.16
+        #:     Electrodes on auto-route preview (see
+        #:     :meth:`set_route_preview`).
+        self._route_preview = None
         self.connections_enabled = (self.connections_alpha > 0)
 
         self.default_corners = {}  # {'canvas': None, 'frame': None}
@@ -175,10 +320,130 @@ class DmfDeviceCanvas(GtkShapesCanvasView):
                                         #group='microdrop.device_info_plugin')
         # Registered route commands
         self.route_commands = OrderedDict()
+        #: .. versionadded:: 0.16
+        #:     Cached flattened layers below/above ``video`` layer (see
+        #:     :meth:`flatten_layer_group`).
+        self._layer_groups = {}
+        #: .. versionadded:: 0.16
+        #:     Thread pool used to render :attr:`async_layers`, or ``None`` to
+        #:     render all layers on the GTK main loop.
+        self.render_executor = (RenderExecutor(render_workers)
+                                if render_workers > 0 else None)
+        #: .. versionadded:: 0.16
+        #:     Generation of each layer, incremented each time a layer render
+        #:     is started.  Results of superseded renders are discarded.
+        self._layer_generations = Counter()
+        # Input versions of layers with pending render jobs.
+        self._pending_layer_versions = {}
+        #: .. versionadded:: 0.16
+        #:     Number of discarded (i.e., superseded) render jobs per layer.
+        self.discarded_render_counts = Counter()
+        # Surface shape and input snapshot (see `render_inputs`) of layers
+        # rendered in current (worker) thread.
+        self._render_local = threading.local()
+        #: .. versionadded:: 0.16
+        #:     Released layer surfaces available for reuse by
+        #:     :meth:`get_surface`, keyed by format, width, and height.
+        self._surface_pool = {}
+        self._surface_pool_lock = threading.Lock()
+        #: .. versionadded:: 0.16
+        #:     Maximum number of pooled surfaces of each format and size.
+        self.max_pooled_surfaces = 8
+        #: .. versionadded:: 0.16
+        #:     Number of surfaces allocated, reused, and released (see
+        #:     :attr:`surface_pool_stats`).
+        self.surface_counts = Counter()
+        # Canvas surface shape of pooled surfaces.
+        self._surface_pool_shape = None
+        #: .. versionadded:: 0.16
+        #:     Position of top-left corner of each cropped layer surface on
+        #:     canvas (see :attr:`layer_formats`).
+        self.layer_offsets = {}
+        #: .. versionadded:: 0.16
+        #:     RGBA color used to composite ``FORMAT_A8`` layer masks (see
+        #:     :attr:`layer_formats`).
+        self.layer_tints = {'connections': (1., 1., 1., 1.),
+                            'registration': (1., 0., 0., 1.)}
+        #: .. versionadded:: 0.16
+        #:     Maximum rate of redraws scheduled by :meth:`request_redraw`.
+        self.max_fps = 60.
+        #: .. versionadded:: 0.16
+        #:     Number of calls to :meth:`request_redraw`.
+        self.redraw_request_count = 0
+        #: .. versionadded:: 0.16
+        #:     Number of redraws executed by :meth:`request_redraw`.
+        self.redraw_count = 0
+        self._redraw_source_id = None
+        self._redraw_time = 0
+        self._redraw_layers = set()
+        self._redraw_regions = []
+        self._redraw_full = False
+        self._redraw_alpha_layers = set()
+        # Name of layer and cached flattened layers below and above it (see
+        # `flatten_alpha_change()`).
+        self._alpha_groups = None
+        #: .. versionadded:: 0.16
+        #:     Time (in seconds) the canvas size must be stable before layers
+        #:     are rebuilt at the new size (see :meth:`check_dirty`).  While
+        #:     resizing, the last composited surface is scaled to fit.
+        self.resize_idle_interval = .25
+        # Time and size of most recent pending size change.
+        self._resize_time = None
+        self._resize_size = None
 
         super(DmfDeviceCanvas, self).__init__(df_shapes, self.shape_i_column,
                                               **kwargs)
 
+    @property
+    def cairo_surface(self):
+        '''
+        Composited canvas surface.
+
+        .. versionadded:: 0.16
+            Replaced surface is released to surface pool (see
+            :meth:`release_surface()`).
+        '''
+        return getattr(self, '_cairo_surface', None)
+
+    @cairo_surface.setter
+    def cairo_surface(self, surface):
+        previous_surface = self.cairo_surface
+        self._cairo_surface = surface
+        if previous_surface is not None and previous_surface is not surface:
+            self.release_surface(previous_surface)
+
+    @property
+    def electrode_states(self):
+        '''
+        **Static** electrode states, indexed by electrode identifier.
+
+        View of :attr:`electrode_state_store` as a :class:`pandas.Series`.
+
+        .. versionadded:: 0.16
+        '''
+        return self.electrode_state_store.series
+
+    @electrode_states.setter
+    def electrode_states(self, value):
+        if self.electrode_state_store.set(value).shape[0]:
+            self.invalidate('electrode_states')
+            self.request_redraw(layers=['static_electrode_state_shapes'])
+
+    @property
+    def dynamic_electrodes(self):
+        '''
+        **Dynamic** electrode states, indexed by electrode identifier.
+
+        .. versionadded:: 0.16
+        '''
+        return self._dynamic_electrodes
+
+    @dynamic_electrodes.setter
+    def dynamic_electrodes(self, value):
+        self._dynamic_electrodes = value
+        self.invalidate('dynamic_electrodes')
+        self.request_redraw(layers=['dynamic_electrode_state_shapes'])
+
     @property
     def df_routes(self):
         '''
@@ -190,8 +455,14 @@ class DmfDeviceCanvas(GtkShapesCanvasView):
     def df_routes(self, value):
         '''
         .. versionadded:: 0.11.3
+
+        .. versionchanged:: 0.16
+            Invalidate ``routes`` layer and schedule redraw (see
+            :meth:`request_redraw()`).
         '''
         self._df_routes = value
+        self.invalidate('df_routes')
+        self.request_redraw(layers=['routes'])
         try:
             self.emit('routes-set', self._df_routes.copy())
         except TypeError:
@@ -221,6 +492,11 @@ class DmfDeviceCanvas(GtkShapesCanvasView):
                             columns=['x', 'y'], dtype=float)
 
     def update_transforms(self):
+        '''
+        .. versionchanged:: 0.16
+            Invalidate ``registration`` layer, rather than rendering it
+            immediately.
+        '''
         from opencv_helpers.safe_cv import cv2
 
         if (self.df_canvas_corners.shape[0] == 0 or
@@ -243,7 +519,8 @@ class DmfDeviceCanvas(GtkShapesCanvasView):
             transform = (self.canvas.shapes_to_canvas_transform.values
                          .dot(transform))
         self.video_sink.transform = transform
-        self.set_surface('registration', self.render_registration())
+        self.invalidate('corners')
+        self.request_redraw(layers=['registration'])
 
     def create_ui(self):
         '''
@@ -265,9 +542,7 @@ class DmfDeviceCanvas(GtkShapesCanvasView):
         self.widget.add_events(gtk.gdk.KEY_PRESS_MASK |
                                gtk.gdk.KEY_RELEASE_MASK)
         # Create initial (empty) cairo surfaces.
-        surface_names = ('background', 'shapes', 'connections', 'routes',
-                         'channel_labels', 'static_electrode_state_shapes',
-                         'dynamic_electrode_state_shapes', 'registration')
+        surface_names = self.layer_dependencies.keys()
         self.df_surfaces = pd.DataFrame([[self.get_surface(), 1.]
                                          for i in xrange(len(surface_names))],
                                         columns=['surface', 'alpha'],
@@ -302,42 +577,162 @@ class DmfDeviceCanvas(GtkShapesCanvasView):
         self.widget.connect("motion_notify_event", _on_mouse_move)
 
     def reset_canvas(self, width, height):
+        '''
+        .. versionchanged:: 0.16
+            Build :attr:`shape_geometry` and :attr:`shape_index` for the new
+            canvas size, and invalidate all layers depending on canvas shape.
+            Shape centers and connection endpoints are mapped from
+            :attr:`device_geometry` (computed once per device) to canvas
+            coordinates using ``canvas.shapes_to_canvas_transform``, rather
+            than recomputed from ``canvas.df_canvas_shapes``.  Center columns
+            of ``canvas.df_canvas_shapes`` (i.e., ``x_center``, ``y_center``,
+            ``x_center_offset``, and ``y_center_offset``) are filled from the
+            mapped centers.
+        '''
         super(DmfDeviceCanvas, self).reset_canvas(width, height)
-        if self.device is None or self.canvas.df_canvas_shapes.shape[0] == 0:
+        self.invalidate('canvas_shape')
+        # Pooled surfaces no longer match canvas size.
+        self.flush_surface_pool()
+        if (self.device_geometry is None or
+                self.canvas.df_canvas_shapes.shape[0] == 0):
             return
 
-        self.canvas.df_canvas_shapes =\
-            compute_shape_centers(self.canvas.df_canvas_shapes
-                                  [[self.shape_i_column, 'vertex_i', 'x',
-                                    'y']], self.shape_i_column)
-        self.canvas.df_shape_centers = (self.canvas.df_canvas_shapes
-                                        [[self.shape_i_column, 'x_center',
-                                          'y_center']].drop_duplicates()
-                                        .set_index(self.shape_i_column))
-        df_shape_connections = self.device.df_shape_connections
-        self.canvas.df_connection_centers =\
-            (df_shape_connections.join(self.canvas.df_shape_centers
-                                       .loc[df_shape_connections.source]
-                                       .reset_index(drop=True))
-             .join(self.canvas.df_shape_centers.loc[df_shape_connections
-                                                    .target]
-                   .reset_index(drop=True), lsuffix='_source',
-                   rsuffix='_target'))
+        self.shape_geometry = \
+            self.device_geometry.transform(self.canvas
+                                           .shapes_to_canvas_transform.values)
+        self.shape_index = ShapeGrid(self.shape_geometry)
+        self._label_images = {}
+        centers = self.shape_geometry.centers
+        self.connection_coords = np.hstack([centers[self.connection_indexes
+                                                    [:, 0]],
+                                            centers[self.connection_indexes
+                                                    [:, 1]]])
+
+        # Center columns and tables (kept for backwards compatibility).
+        df_shapes = self.canvas.df_canvas_shapes
+        shape_centers = \
+            centers[pd.Index(self.shape_geometry.shape_ids)
+                    .get_indexer(df_shapes[self.shape_i_column])]
+        center_columns = ['x_center', 'y_center', 'x_center_offset',
+                          'y_center_offset']
+        df_centers = pd.DataFrame(np.hstack([shape_centers,
+                                             df_shapes[['x', 'y']].values -
+                                             shape_centers]),
+                                  columns=center_columns,
+                                  index=df_shapes.index)
+        self.canvas.df_canvas_shapes = (df_shapes.drop(center_columns, axis=1,
+                                                       errors='ignore')
+                                        .join(df_centers))
+        self.canvas.df_shape_centers = \
+            pd.DataFrame(centers, columns=['x_center', 'y_center'],
+                         index=pd.Index(self.shape_geometry.shape_ids,
+                                        name=self.shape_i_column))
+        self.canvas.df_connection_centers = \
+            pd.DataFrame(self.connection_coords,
+                         columns=['x_center_source', 'y_center_source',
+                                  'x_center_target', 'y_center_target'],
+                         index=self.connection_labels)
 
     def reset_states(self):
-        self.electrode_states = pd.Series(name='electrode_states')
-        self.electrode_states.index.name = 'electrode_id'
+        '''
+        .. versionchanged:: 0.16
+            Reset :attr:`electrode_state_store` to the electrodes of the
+            current device (all off), in device electrode index order (i.e.,
+            ``device.shape_indexes``).  This order is also the order of
+            binary electrode states (see
+            :meth:`DevicePlugin.negotiate_state_format`).
+        '''
+        if self.device is None:
+            electrode_ids = []
+        else:
+            electrode_ids = (self.device.shape_indexes.sort_values()
+                             .index.values)
+        #: .. versionadded:: 0.16
+        #:     **Static** electrode states, in device electrode order.
+        self.electrode_state_store = ElectrodeStates(electrode_ids)
+        self.invalidate('electrode_states')
+
+    def set_electrode_states(self, electrode_states, merge=False):
+        '''
+        Set **static** electrode states and update the
+        ``static_electrode_state_shapes`` layer and the composited canvas
+        surface.
+
+        If :attr:`incremental_electrode_states` is set, only electrodes with
+        changed states are repainted (see
+        :meth:`update_static_electrode_state_shapes()`).
+
+        Parameters
+        ----------
+        electrode_states : pandas.Series or ElectrodeStates
+            Electrode states, indexed by electrode identifier.
+        merge : bool, optional
+            If ``True``, merge states into existing states (see
+            :meth:`ElectrodeStates.update`).  Otherwise, electrodes not in
+            ``electrode_states`` are turned off.
+
+        Returns
+        -------
+        tuple or None
+            Rectangle ``(x, y, width, height)`` of canvas region requiring a
+            redraw, or ``None`` if no redraw is required.
+
+
+        .. versionadded:: 0.16
+        '''
+        layer = 'static_electrode_state_shapes'
+        # Only update layer incrementally if it is otherwise up to date.
+        incremental = (self.incremental_electrode_states and layer not in
+                       self.stale_layers())
+        store = self.electrode_state_store
+        changed = (store.update(electrode_states) if merge
+                   else store.set(electrode_states))
+        if not changed.shape[0]:
+            return None
+        self.invalidate('electrode_states')
+
+        if not incremental:
+            self.update_layers([layer])
+            self.cairo_surface = self.flatten_layers()
+            return (0, 0) + tuple(self.get_surface_shape())
+
+        region = self.update_static_electrode_state_shapes(store.electrode_ids
+                                                           [changed])
+        self._layer_input_versions[layer] = self.get_input_versions(layer)
+        if region is not None:
+            self.flatten_region(*region)
+        return region
 
     def reset_routes(self):
         self.df_routes = pd.DataFrame(None, columns=['route_i', 'electrode_i',
                                                      'transition_i'])
 
     def set_device(self, dmf_device):
+        '''
+        .. versionchanged:: 0.16
+            Invalidate all layers depending on device, build
+            :attr:`electrode_neighbours` look up, and replace
+            :attr:`path_cache` (shortest paths are precomputed in a background
+            thread).
+        '''
         self.device = dmf_device
         # Index channels by electrode ID for fast look up.
         self.electrode_channels = (self.device.df_electrode_channels
                                    .set_index('electrode_id'))
         self.df_shapes = self.device.df_shapes
+        self.electrode_neighbours = \
+            get_neighbours(self.device.df_shape_connections,
+                           self.df_shapes[self.shape_i_column].unique())
+        if self.path_cache is not None:
+            self.path_cache.cancel()
+        self.path_cache = PathCache(self.electrode_neighbours)
+        self.path_cache.start()
+        self.reset_device_geometry()
+        self.shape_geometry = None
+        self.connection_coords = None
+        self.shape_index = None
+        self._label_images = {}
+        self.invalidate('device')
         self.reset_routes()
         self.reset_states()
         x, y, width, height = self.widget.get_allocation()
@@ -346,6 +741,61 @@ class DmfDeviceCanvas(GtkShapesCanvasView):
             self._dirty_size = width, height
         self.emit('device-set', dmf_device)
 
+    def reset_device_geometry(self):
+        '''
+        Compile electrode geometry and connection endpoints of device in
+        device (i.e., shape) coordinates.
+
+        Canvas coordinates are mapped from the device geometry on each resize
+        (see :meth:`reset_canvas`).
+
+
+        .. versionadded:: 0.16
+        '''
+        if self.device is None or self.df_shapes.shape[0] == 0:
+            self.device_geometry = None
+            self.connection_indexes = None
+            self.connection_labels = None
+            self.shape_degrees = None
+            return
+        self.device_geometry = ShapeGeometry.from_frame(self.df_shapes,
+                                                        self.shape_i_column)
+        df_shape_connections = self.device.df_shape_connections
+        shape_ids = pd.Index(self.device_geometry.shape_ids)
+        indexes = np.column_stack([shape_ids.get_indexer(df_shape_connections
+                                                         .source),
+                                   shape_ids.get_indexer(df_shape_connections
+                                                         .target)])
+        # Skip connections to unknown electrodes.
+        known = (indexes >= 0).all(axis=1)
+        self.connection_indexes = indexes[known]
+        self.connection_labels = df_shape_connections.index[known]
+        self.shape_degrees = np.bincount(self.connection_indexes.ravel(),
+                                         minlength=len(self.device_geometry))
+
+    def find_shape(self, x, y):
+        '''
+        Parameters
+        ----------
+        x, y : float
+            Canvas coordinates.
+
+        Returns
+        -------
+        str or None
+            Identifier of electrode at specified canvas coordinates, or
+            ``None`` if there is no electrode at the coordinates.
+
+
+        .. versionadded:: 0.16
+            Look up electrode using :attr:`shape_index` (constant time),
+            falling back to ``canvas.find_shape()`` if the index has not been
+            built.
+        '''
+        if self.shape_index is not None:
+            return self.shape_index.find_shape(x, y)
+        return self.canvas.find_shape(x, y)
+
     def get_labels(self):
         if self.device is None:
             return pd.Series(None, index=pd.Index([], name='channel'))
@@ -458,13 +908,18 @@ class DmfDeviceCanvas(GtkShapesCanvasView):
         target_cairo_context = cairo.Context(target_surface)
         target_cairo_context.set_source_surface(source_surface, 0, 0)
         target_cairo_context.paint()
+        if source_name in self.layer_offsets:
+            self.layer_offsets[target_name] = self.layer_offsets[source_name]
+        if source_name in self.layer_tints:
+            self.layer_tints[target_name] = self.layer_tints[source_name]
         self.insert_surface(target_position, target_name, target_surface,
                             alpha)
 
     def enable(self):
         if self.callback_id is None:
             self._enabled = True
-            self.set_surface('shapes', self.render_shapes())
+            self.invalidate('video_enabled')
+            self.update_layers(['shapes'])
 
             # Add layer to which video frames will be rendered.
             if 'video' in self.df_surfaces.index:
@@ -488,7 +943,8 @@ class DmfDeviceCanvas(GtkShapesCanvasView):
     def disable(self):
         if self.callback_id is not None:
             self._enabled = False
-            self.set_surface('shapes', self.render_shapes())
+            self.invalidate('video_enabled')
+            self.update_layers(['shapes'])
             self.video_sink.disconnect(self.callback_id)
             self.callback_id = None
             if 'video' in self.df_surfaces.index:
@@ -500,6 +956,25 @@ class DmfDeviceCanvas(GtkShapesCanvasView):
     ###########################################################################
     # ## Drawing area event handling ##
     def check_dirty(self):
+        '''
+        .. versionchanged:: 0.16
+            Rebuild layers with stale inputs (if any) and schedule redraw
+            through :meth:`request_redraw()`.  While the canvas is being
+            resized, draw scaled copy of last composited surface (see
+            :meth:`draw_provisional()`), and defer rebuilding canvas until the
+            size has been stable for :attr:`resize_idle_interval` seconds.
+        '''
+        if (self.shape is not None and self._dirty_size is not None and
+                self._dirty_size != self.shape):
+            now = time.time()
+            if self._dirty_size != self._resize_size:
+                # Size changed since last check.
+                self._resize_size = self._dirty_size
+                self._resize_time = now
+                self.draw_provisional()
+            if now - self._resize_time < self.resize_idle_interval:
+                return True
+        self._resize_size = None
         if self._dirty_size is not None:
             width, height = self._dirty_size
             self.set_shape(width, height)
@@ -509,8 +984,143 @@ class DmfDeviceCanvas(GtkShapesCanvasView):
         result = super(DmfDeviceCanvas, self).check_dirty()
         if transform_update_required:
             gtk.idle_add(self.update_transforms)
+        elif self._dirty_size is None and self.layers_to_render():
+            self.request_redraw()
         return result
 
+    def request_redraw(self, layers=None, region=None, alpha_layer=None):
+        '''
+        Schedule redraw of canvas.
+
+        Requests are coalesced such that at most one redraw runs per frame
+        interval (i.e., ``1 / max_fps`` seconds, see :attr:`max_fps`).  Each
+        redraw renders requested and stale layers, re-composites the layer
+        stack, and paints the widget.
+
+        Parameters
+        ----------
+        layers : list, optional
+            Names of layers to render (regardless of whether or not they are
+            stale).
+        region : tuple, optional
+            Rectangle ``(x, y, width, height)`` to paint, for callers that
+            already re-composited the region (e.g., using
+            :meth:`flatten_region()`).  By default, re-composite and paint the
+            whole canvas.
+        alpha_layer : str, optional
+            Name of layer whose alpha has changed (and nothing else).  If it
+            is the only change before the next redraw, the layer is
+            composited between cached flattened surfaces of the layers below
+            and above it (see :meth:`flatten_alpha_change()`).
+
+
+        .. versionadded:: 0.16
+        '''
+        self.redraw_request_count += 1
+        if layers:
+            self._redraw_layers.update(layers)
+        if alpha_layer is not None:
+            self._redraw_alpha_layers.add(alpha_layer)
+        elif region is None:
+            self._redraw_full = True
+        else:
+            self._redraw_regions.append(region)
+        if self._redraw_source_id is None:
+            delay = self._redraw_time + 1. / self.max_fps - time.time()
+            if delay > 0:
+                self._redraw_source_id = gtk.timeout_add(int(delay * 1000) +
+                                                         1, self._redraw)
+            else:
+                self._redraw_source_id = gtk.idle_add(self._redraw)
+
+    def _redraw(self):
+        self._redraw_source_id = None
+        if self.canvas is None:
+            # Requests are kept until canvas is built (see
+            # :meth:`check_dirty()`).
+            return False
+        self._redraw_time = time.time()
+        self.redraw_count += 1
+        layers, self._redraw_layers = self._redraw_layers, set()
+        regions, self._redraw_regions = self._redraw_regions, []
+        full, self._redraw_full = self._redraw_full, False
+        alpha_layers, self._redraw_alpha_layers = (self._redraw_alpha_layers,
+                                                   set())
+
+        rendered = self.update_layers([name for name in self.layer_dependencies
+                                       if name in layers])
+        rendered += self.update_layers()
+        if not (full or rendered) and len(alpha_layers) == 1:
+            # Only the alpha of a single layer changed.
+            self.cairo_surface = self.flatten_alpha_change(alpha_layers
+                                                           .pop())
+            self.draw()
+        elif full or rendered or alpha_layers:
+            self.cairo_surface = self.flatten_layers()
+            self.draw()
+        else:
+            for region in regions:
+                self.draw(region)
+        # Remove idle/timeout callback.
+        return False
+
+    def check_redraw_allocations(self):
+        '''
+        Update every layer and redraw the whole canvas twice, and count the
+        surfaces allocated (i.e., not reused from the surface pool) by the
+        second update.
+
+        Any pending scheduled redraw is cancelled first (see
+        :meth:`request_redraw()`), and layers are rendered on the GTK main
+        loop (i.e., without :attr:`render_executor`), such that all
+        allocations made by each update are counted.
+
+        In steady state, each update should reuse the surfaces released by
+        the previous update (see :meth:`release_surface()`) and allocate
+        nothing.
+
+        Returns
+        -------
+        int
+            Number of surfaces allocated by second update.
+
+
+        .. versionadded:: 0.16
+        '''
+        if self._redraw_source_id is not None:
+            gobject.source_remove(self._redraw_source_id)
+            self._redraw_source_id = None
+        render_executor, self.render_executor = self.render_executor, None
+        try:
+            for i in xrange(2):
+                allocated = self.surface_counts['allocated']
+                # Re-render every layer, as for an update of all inputs.
+                self._redraw_layers.update(self.layer_dependencies)
+                self._redraw_full = True
+                self._redraw()
+        finally:
+            self.render_executor = render_executor
+        allocated = self.surface_counts['allocated'] - allocated
+        if allocated:
+            logger.warning('Steady-state update allocated %d surface(s).',
+                           allocated)
+        return allocated
+
+    @property
+    def redraw_stats(self):
+        '''
+        Returns
+        -------
+        pandas.Series
+            Number of redraws requested and executed (see
+            :meth:`request_redraw()`).
+
+
+        .. versionadded:: 0.16
+        '''
+        return pd.Series([self.redraw_request_count, self.redraw_count],
+                         index=['requested', 'executed'])
+
     def set_shape(self, width, height):
         logger.debug('[set_shape]: Set drawing area shape to %sx%s', width,
                      height)
@@ -523,6 +1133,123 @@ class DmfDeviceCanvas(GtkShapesCanvasView):
 
     ###########################################################################
     # ## Drawing methods ##
+    def get_surface_shape(self):
+        '''
+        Returns
+        -------
+        tuple
+            Width and height of canvas layer surfaces.
+
+
+        .. versionadded:: 0.16
+        '''
+        x, y, width, height = self.widget.get_allocation()
+        return width, height
+
+    def get_surface(self, format_=cairo.FORMAT_ARGB32, shape=None):
+        '''
+        Parameters
+        ----------
+        format_ : int, optional
+            Surface format (e.g., ``cairo.FORMAT_A8``).
+        shape : tuple, optional
+            Surface width and height (default: canvas size).  Only canvas
+            sized surfaces are pooled, so other sizes are always allocated.
+
+        Returns
+        -------
+        cairo.ImageSurface
+            Blank surface.
+
+
+        .. versionadded:: 0.16
+            Reuse (cleared) surface released to pool, if available (see
+            :meth:`release_surface()`).  Use surface shape captured on the GTK
+            main loop when called from a render worker thread (see
+            :attr:`render_executor`).
+        '''
+        if shape is None:
+            shape = getattr(self._render_local, 'shape', None)
+        width, height = (self.get_surface_shape() if shape is None
+                         else shape)
+        with self._surface_pool_lock:
+            surfaces = self._surface_pool.get((format_, width, height))
+            surface = surfaces.pop() if surfaces else None
+            self.surface_counts['allocated' if surface is None
+                                else 'reused'] += 1
+        if surface is None:
+            return cairo.ImageSurface(format_, width, height)
+        cairo_context = cairo.Context(surface)
+        cairo_context.set_operator(cairo.OPERATOR_CLEAR)
+        cairo_context.paint()
+        return surface
+
+    def release_surface(self, surface):
+        '''
+        Return surface to pool for reuse by :meth:`get_surface()`.
+
+        Surfaces are pooled by format and size.  Only canvas sized surfaces
+        are pooled; other surfaces (e.g., cropped layers, see
+        :attr:`layer_formats`) are discarded, since their sizes are rarely
+        requested again.
+
+        The surface **must not** be referenced after it is released.
+
+        Parameters
+        ----------
+        surface : cairo.ImageSurface
+
+
+        .. versionadded:: 0.16
+        '''
+        if (surface.get_width(), surface.get_height()) != \
+                self._surface_pool_shape:
+            # Only canvas sized surfaces are pooled (i.e., not cropped
+            # layers).
+            return
+        key = surface.get_format(), surface.get_width(), surface.get_height()
+        with self._surface_pool_lock:
+            surfaces = self._surface_pool.setdefault(key, [])
+            if (len(surfaces) < self.max_pooled_surfaces and
+                    all(s is not surface for s in surfaces)):
+                surfaces.append(surface)
+                self.surface_counts['released'] += 1
+
+    def flush_surface_pool(self):
+        '''
+        Discard all pooled surfaces (e.g., when canvas is resized).
+
+
+        .. versionadded:: 0.16
+        '''
+        with self._surface_pool_lock:
+            self._surface_pool = {}
+            self._surface_pool_shape = self.get_surface_shape()
+
+    @property
+    def surface_pool_stats(self):
+        '''
+        Returns
+        -------
+        pandas.Series
+            Number of surfaces allocated, reused from the pool, and released
+            to the pool, along with the number and total size (in bytes) of
+            currently pooled surfaces.
+
+
+        .. versionadded:: 0.16
+        '''
+        with self._surface_pool_lock:
+            surfaces = [s for surfaces in self._surface_pool.itervalues()
+                        for s in surfaces]
+        return pd.Series([self.surface_counts['allocated'],
+                          self.surface_counts['reused'],
+                          self.surface_counts['released'], len(surfaces),
+                          sum(s.get_stride() * s.get_height()
+                              for s in surfaces)],
+                         index=['allocated', 'reused', 'released',
+                                'pooled_count', 'pooled_bytes'])
+
     def get_surfaces(self):
         surface1 = cairo.ImageSurface(cairo.FORMAT_ARGB32, 320, 240)
         surface1_context = cairo.Context(surface1)
@@ -541,6 +1268,60 @@ class DmfDeviceCanvas(GtkShapesCanvasView):
 
         return [surface1, surface2]
 
+    def draw(self, region=None):
+        '''
+        Paint composited canvas surface on widget.
+
+        Parameters
+        ----------
+        region : tuple, optional
+            Rectangle ``(x, y, width, height)`` to paint.  By default, paint
+            the whole surface.
+
+
+        .. versionadded:: 0.16
+            Support painting a region of the widget.
+        '''
+        if region is None:
+            return super(DmfDeviceCanvas, self).draw()
+        if self.cairo_surface is None or self.widget.window is None:
+            return
+        cairo_context = self.widget.window.cairo_create()
+        cairo_context.rectangle(*region)
+        cairo_context.clip()
+        cairo_context.set_source_surface(self.cairo_surface, 0, 0)
+        cairo_context.paint()
+
+    def draw_provisional(self):
+        '''
+        Paint last composited surface scaled (preserving aspect ratio) to fit
+        the current widget allocation.
+
+        Used as a cheap placeholder while the canvas is being resized (see
+        :meth:`check_dirty()`).
+
+
+        .. versionadded:: 0.16
+        '''
+        if self.cairo_surface is None or self.widget.window is None:
+            return
+        width, height = self.get_surface_shape()
+        surface_width = self.cairo_surface.get_width()
+        surface_height = self.cairo_surface.get_height()
+        if min(width, height, surface_width, surface_height) <= 0:
+            return
+        scale = min(float(width) / surface_width,
+                    float(height) / surface_height)
+        cairo_context = self.widget.window.cairo_create()
+        cairo_context.set_source_rgb(0, 0, 0)
+        cairo_context.paint()
+        cairo_context.translate(.5 * (width - scale * surface_width),
+                                .5 * (height - scale * surface_height))
+        cairo_context.scale(scale, scale)
+        cairo_context.set_source_surface(self.cairo_surface, 0, 0)
+        cairo_context.get_source().set_filter(cairo.FILTER_FAST)
+        cairo_context.paint()
+
     def draw_surface(self, surface, operator=cairo.OPERATOR_OVER):
         x, y, width, height = self.widget.get_allocation()
         if width <= 0 and height <= 0 or self.widget.window is None:
@@ -564,14 +1345,15 @@ class DmfDeviceCanvas(GtkShapesCanvasView):
 
 
         .. versionadded:: 0.12
+
+        .. versionchanged:: 0.16
+            Select actuated electrodes by identifier (see
+            :attr:`shape_geometry`) instead of copying the canvas shapes
+            table.
         '''
-        df_shapes = self.canvas.df_canvas_shapes.copy()
         # Only include shapes for electrodes reported as actuated.
         on_electrodes = self._dynamic_electrodes[self._dynamic_electrodes > 0]
-        df_shapes = (df_shapes.set_index('id').loc[on_electrodes.index]
-                     .reset_index())
-
-        return self.render_electrode_shapes(df_shapes=df_shapes,
+        return self.render_electrode_shapes(electrode_ids=on_electrodes.index,
                                             shape_scale=0.75,
                                             # Lignt blue
                                             fill=(136 / 255.,
@@ -589,18 +1371,124 @@ class DmfDeviceCanvas(GtkShapesCanvasView):
 
 
         .. versionadded:: 0.12
+
+        .. versionchanged:: 0.16
+            Select actuated electrodes by identifier (see
+            :attr:`shape_geometry`) instead of copying the canvas shapes
+            table.
+        '''
+        return self.render_electrode_shapes(electrode_ids=
+                                            self.electrode_state_store
+                                            .active())
+
+    def update_static_electrode_state_shapes(self, electrode_ids):
+        '''
+        Repaint **static** states of selected electrodes in place on the
+        existing ``static_electrode_state_shapes`` layer.
+
+        Only the bounding boxes of the selected electrodes are cleared and
+        repainted, such that the cost is proportional to the number of
+        selected electrodes rather than the size of the device.
+
+        See also :meth:`render_static_electrode_state_shapes()`.
+
+        Parameters
+        ----------
+        electrode_ids : list-like
+            Identifiers of electrodes to repaint.
+
+        Returns
+        -------
+        tuple or None
+            Rectangle ``(x, y, width, height)`` enclosing repainted region, or
+            ``None`` if nothing was repainted.
+
+
+        .. versionadded:: 0.16
         '''
-        df_shapes = self.canvas.df_canvas_shapes.copy()
-        if self.electrode_states.shape[0]:
-            df_shapes['state'] = self.electrode_states.ix[df_shapes.id].values
+        geometry = self.shape_geometry
+        surface = self.df_surfaces.surface.get('static_electrode_state_shapes')
+        if geometry is None or surface is None:
+            return None
+        width, height = surface.get_width(), surface.get_height()
+        if (width, height) != tuple(self.get_surface_shape()):
+            # Layer does not match canvas size; render whole layer.
+            self.render_layer('static_electrode_state_shapes')
+            return (0, 0) + tuple(self.get_surface_shape())
+
+        indexes = geometry.indexes(electrode_ids)
+        if not indexes.shape[0]:
+            return None
+
+        # Dirty rectangles (padded to include anti-aliased edges).
+        rect_min = np.clip(np.floor(geometry.bbox_min[indexes]) - 1, 0,
+                           [width, height]).astype(int)
+        rect_max = np.clip(np.ceil(geometry.bbox_max[indexes]) + 1, 0,
+                           [width, height]).astype(int)
+        union_min = rect_min.min(axis=0)
+        union_max = rect_max.max(axis=0)
+
+        if self.electrode_shapes_engine == 'raster':
+            # Shapes do not overlap in label image, so only the pixels of the
+            # selected electrodes need to be updated.
+            label_image = self.get_label_image(0.8, width, height)
+            states = (self.electrode_state_store
+                      .lookup(geometry.shape_ids[indexes]) > 0)
+            label_image.fill(surface, indexes[states], (1, 1, 1))
+            label_image.fill(surface, indexes[~states], (0, 0, 0, 0))
         else:
-            df_shapes['state'] = 0
-        df_shapes = df_shapes.loc[df_shapes.state > 0].dropna(subset=['state'])
+            cairo_context = cairo.Context(surface)
+            for (x0, y0), (x1, y1) in zip(rect_min.tolist(),
+                                          rect_max.tolist()):
+                cairo_context.rectangle(x0, y0, x1 - x0, y1 - y0)
+            cairo_context.clip()
+            cairo_context.set_operator(cairo.OPERATOR_CLEAR)
+            cairo_context.paint()
+            cairo_context.set_operator(cairo.OPERATOR_OVER)
+
+            # Repaint actuated electrodes overlapping the dirty rectangles (the
+            # clip region restricts painting to the dirty rectangles).
+            on_indexes = geometry.indexes(self.electrode_state_store.active())
+            overlapping = ((geometry.bbox_max[on_indexes] >= union_min) &
+                           (geometry.bbox_min[on_indexes] <=
+                            union_max)).all(axis=1)
+            geometry.append_paths(cairo_context, on_indexes[overlapping],
+                                  scale=0.8)
+            cairo_context.set_source_rgb(1, 1, 1)
+            cairo_context.fill()
+            surface.flush()
+        self.invalidate_layer_groups('static_electrode_state_shapes')
+        self.emit('surface-rendered', 'static_electrode_state_shapes', surface)
+        return tuple(union_min.tolist()) + tuple((union_max -
+                                                  union_min).tolist())
+
+    def get_label_image(self, shape_scale, width, height):
+        '''
+        Parameters
+        ----------
+        shape_scale : float
+            Scale of each electrode about its center.
+        width, height : int
+            Size of image.
+
+        Returns
+        -------
+        LabelImage
+            Electrode label image, cached until the device or canvas shape
+            changes.
+
 
-        return self.render_electrode_shapes(df_shapes=df_shapes)
+        .. versionadded:: 0.16
+        '''
+        key = shape_scale, width, height
+        if key not in self._label_images:
+            self._label_images[key] = LabelImage(self.shape_geometry, width,
+                                                 height, scale=shape_scale)
+        return self._label_images[key]
 
     def render_electrode_shapes(self, df_shapes=None, shape_scale=0.8,
-                                fill=(1, 1, 1)):
+                                fill=(1, 1, 1), electrode_ids=None,
+                                engine=None):
         '''
         Render electrode state shapes.
 
@@ -610,45 +1498,60 @@ class DmfDeviceCanvas(GtkShapesCanvasView):
 
         Parameters
         ----------
-        df_shapes = : pandas.DataFrame
+        df_shapes : pandas.DataFrame, optional
+            Table of shape vertices.  Only the electrodes listed in the shape
+            identifier column are drawn.
+        shape_scale : float, optional
+            Scale of each electrode about its center (leaves shape edges
+            uncovered).
+        fill : tuple, optional
+            RGB or RGBA fill color.
+        electrode_ids : list-like, optional
+            Identifiers of electrodes to draw (takes precedence over
+            :data:`df_shapes`).
+
+            By default, draw all electrodes.
+        engine : str, optional
+            ``'cairo'`` to fill Cairo paths, or ``'raster'`` to gather fill
+            colors from an electrode label image (see
+            :meth:`get_label_image`).  Both produce the same output to within
+            a pixel at electrode edges (the label image is not
+            anti-aliased).
+
+            By default, use :attr:`electrode_shapes_engine`.
 
 
         .. versionadded:: 0.12
+
+        .. versionchanged:: 0.16
+            Draw precompiled Cairo paths from :attr:`shape_geometry` with a
+            single fill, rather than grouping canvas shapes table by
+            electrode.  Add ``electrode_ids`` and ``engine`` keyword
+            arguments.
         '''
         surface = self.get_surface()
-        if df_shapes is None:
-            if hasattr(self.canvas, 'df_canvas_shapes'):
-                df_shapes = self.canvas.df_canvas_shapes
-            else:
-                return surface
-        if 'x_center' not in df_shapes or 'y_center' not in df_shapes:
-            # No center points have been computed for shapes.
+        if self.shape_geometry is None:
+            return surface
+        if electrode_ids is None and df_shapes is not None:
+            electrode_ids = df_shapes[self.shape_i_column].unique()
+        indexes = (None if electrode_ids is None
+                   else self.shape_geometry.indexes(electrode_ids))
+
+        if (engine or self.electrode_shapes_engine) == 'raster':
+            label_image = self.get_label_image(shape_scale,
+                                               surface.get_width(),
+                                               surface.get_height())
+            if indexes is None:
+                indexes = np.arange(len(self.shape_geometry))
+            label_image.render(surface, indexes, fill)
             return surface
 
         cairo_context = cairo.Context(surface)
-
-        df_shapes = df_shapes.copy()
-        # Scale shapes to leave shape edges uncovered.
-        df_shapes[['x', 'y']] = (df_shapes[['x_center', 'y_center']] +
-                                 df_shapes[['x_center_offset',
-                                            'y_center_offset']].values *
-                                 shape_scale)
-
-        for path_id, df_path_i in (df_shapes.groupby(self.canvas
-                                                     .shape_i_columns)[['x',
-                                                                        'y']]):
-            # Use attribute lookup for `x` and `y`, since it is considerably
-            # faster than `get`-based lookup using columns name strings.
-            vertices_x = df_path_i.x.values
-            vertices_y = df_path_i.y.values
-            cairo_context.move_to(vertices_x[0], vertices_y[0])
-            for x, y in itertools.izip(vertices_x[1:], vertices_y[1:]):
-                cairo_context.line_to(x, y)
-            cairo_context.close_path()
-
-            # Draw filled shape to indicate actuated electrode state.
-            cairo_context.set_source_rgba(*fill)
-            cairo_context.fill()
+        self.shape_geometry.append_paths(cairo_context, indexes,
+                                         scale=shape_scale)
+        # Draw filled shapes to indicate actuated electrode states.
+        cairo_context.set_source_rgba(*fill)
+        cairo_context.fill()
         return surface
 
     def render_background(self):
@@ -660,30 +1563,49 @@ class DmfDeviceCanvas(GtkShapesCanvasView):
 
     def render_connections(self, indexes=None, hex_color='#fff', alpha=1.,
                            **kwargs):
+        '''
+        Render line between the centers of each pair of connected electrodes.
+
+        Parameters
+        ----------
+        indexes : list-like, optional
+            Index labels (in ``device.df_shape_connections``) of connections
+            to draw.  By default, draw all connections.
+        hex_color : str, optional
+            Line color.
+        alpha : float, optional
+            Line alpha (only used if ``hex_color`` has no alpha channel).
+        **kwargs
+            Cairo context attributes to set before stroking (e.g.,
+            ``line_width=2`` calls ``set_line_width(2)``).
+
+
+        .. versionchanged:: 0.16
+            Trace all connections from :attr:`connection_coords` as a single
+            path and stroke once, rather than iterating over connections
+            table rows and stroking each connection.
+        '''
         surface = self.get_surface()
-        if not hasattr(self.canvas, 'df_connection_centers'):
+        coords = self.get_render_input('connection_coords')
+        if coords is None:
             return surface
         cairo_context = cairo.Context(surface)
-        coords_columns = ['source', 'target',
-                          'x_center_source', 'y_center_source',
-                          'x_center_target', 'y_center_target']
-        df_connection_coords = (self.canvas.df_connection_centers
-                                [coords_columns])
         if indexes is not None:
-            df_connection_coords = df_connection_coords.loc[indexes].copy()
+            positions = (self.get_render_input('connection_labels')
+                         .get_indexer(indexes))
+            coords = coords[positions[positions >= 0]]
 
         rgba = hex_color_to_rgba(hex_color, normalize_to=1.)
         if rgba[-1] is None:
             rgba = rgba[:-1] + (alpha, )
         cairo_context.set_line_width(2.5)
-        for i, (target, source, x1, y1, x2, y2) in (df_connection_coords
-                                                    .iterrows()):
+        cairo_context.set_source_rgba(*rgba)
+        for k, v in kwargs.iteritems():
+            getattr(cairo_context, 'set_' + k)(v)
+        for x1, y1, x2, y2 in coords.tolist():
             cairo_context.move_to(x1, y1)
-            cairo_context.set_source_rgba(*rgba)
-            for k, v in kwargs.iteritems():
-                getattr(cairo_context, 'set_' + k)(v)
             cairo_context.line_to(x2, y2)
-            cairo_context.stroke()
+        cairo_context.stroke()
         return surface
 
     def render_shapes(self, df_shapes=None, clip=False):
@@ -696,90 +1618,340 @@ class DmfDeviceCanvas(GtkShapesCanvasView):
         blue.
 
         See also :meth:`render_electrode_state_shapes()`.
+
+
+        .. versionchanged:: 0.16
+            Draw precompiled Cairo paths from :attr:`shape_geometry`, with one
+            fill/stroke per style (i.e., connected or disconnected electrode),
+            rather than grouping canvas shapes table by electrode.  If
+            ``df_shapes`` is specified, only the electrodes listed in the
+            shape identifier column are drawn.
         '''
         surface = self.get_surface()
+        geometry = self.get_render_input('shape_geometry')
+        if geometry is None:
+            return surface
         if df_shapes is None:
-            if hasattr(self.canvas, 'df_canvas_shapes'):
-                df_shapes = self.canvas.df_canvas_shapes
-            else:
-                return surface
+            indexes = np.arange(len(geometry))
+        else:
+            indexes = geometry.indexes(df_shapes[self.shape_i_column]
+                                       .unique())
 
+        # Electrodes that are not mapped to any channel are drawn magenta.
+        connected = np.in1d(geometry.shape_ids[indexes],
+                            self.get_render_input('electrode_channels')
+                            .index.values)
         cairo_context = cairo.Context(surface)
 
-        for path_id, df_path_i in (df_shapes
-                                   .groupby(self.canvas
-                                            .shape_i_columns)[['x', 'y']]):
-            # Use attribute lookup for `x` and `y`, since it is considerably
-            # faster than `get`-based lookup using columns name strings.
-            vertices_x = df_path_i.x.values
-            vertices_y = df_path_i.y.values
-            cairo_context.move_to(vertices_x[0], vertices_y[0])
-            for x, y in itertools.izip(vertices_x[1:], vertices_y[1:]):
-                cairo_context.line_to(x, y)
-            cairo_context.close_path()
-
-            if self.enabled:
-                # Video is enabled.
-
-                # Draw white border around electrode.
-                line_width = 1
-                if path_id not in self.electrode_channels.index:
-                    #         on  off on  off
-                    dashes = [10, 10]
-                    color = (1, 0, 1)
-                    line_width *= 2
-                else:
-                    dashes = []
-                    color = (1, 1, 1)
+        if self.get_render_input('enabled'):
+            # Video is enabled.
+
+            # Draw white border around electrode.
+            #                           on  off on  off
+            for mask, dashes, color, line_width in ((connected, [], (1, 1, 1),
+                                                     1),
+                                                    (~connected, [10, 10],
+                                                     (1, 0, 1), 2)):
+                geometry.append_paths(cairo_context, indexes[mask])
                 cairo_context.set_dash(dashes)
                 cairo_context.set_line_width(line_width)
                 cairo_context.set_source_rgb(*color)
                 cairo_context.stroke()
-            else:
-                # Video is enabled.  Fill electrode blue.
-                color = ((0, 0, 1) if path_id in self.electrode_channels.index
-                         else (1, 0, 1))
+        else:
+            # Video is disabled.  Fill electrode blue.
+            for mask, color in ((connected, (0, 0, 1)),
+                                (~connected, (1, 0, 1))):
+                geometry.append_paths(cairo_context, indexes[mask])
                 cairo_context.set_source_rgb(*color)
-                cairo_context.fill_preserve()
-                # Draw white border around electrode.
-                cairo_context.set_line_width(1)
-                cairo_context.set_source_rgba(1, 1, 1)
-                cairo_context.stroke()
+                cairo_context.fill()
+            # Draw white border around electrode.
+            geometry.append_paths(cairo_context, indexes)
+            cairo_context.set_line_width(1)
+            cairo_context.set_source_rgba(1, 1, 1)
+            cairo_context.stroke()
         return surface
 
     def render_routes(self):
+        '''
+        .. versionchanged:: 0.16
+            Draw all routes in one pass from flat arrays of route and
+            electrode indexes, with one stroke (and one fill for endpoint
+            markers) per route color.  Reservoir routes and endpoint markers
+            are looked up from :attr:`shape_degrees` and
+            :attr:`shape_geometry`, respectively.
+        '''
         surface = self.get_surface()
+        geometry = self.get_render_input('shape_geometry')
+        shape_degrees = self.get_render_input('shape_degrees')
+        df_routes = self.get_render_input('df_routes')
+        if (geometry is None or shape_degrees is None or
+                not df_routes.shape[0]):
+            return surface
 
-        if (not hasattr(self.device, 'df_shape_connections') or
-                not hasattr(self.canvas, 'df_shape_centers')):
+        # Flat `(route_i, electrode_i)` arrays, grouped by route (stable sort
+        # preserves transition order within each route).
+        order = np.argsort(df_routes.route_i.values, kind='mergesort')
+        route_i = df_routes.route_i.values[order]
+        electrode_i = np.array([geometry.index.get(electrode_id, -1)
+                                for electrode_id in
+                                df_routes.electrode_i.values[order]],
+                               dtype=int)
+        valid = electrode_i >= 0
+        route_i, electrode_i = route_i[valid], electrode_i[valid]
+        if not route_i.shape[0]:
             return surface
+        starts = np.r_[0, np.flatnonzero(route_i[1:] != route_i[:-1]) + 1]
+        ends = np.r_[starts[1:], route_i.shape[0]]
+
+        centers = geometry.centers[electrode_i].tolist()
+        # Mark end of each route with (scaled) bounding box of last electrode.
+        endpoint_markers = geometry.bbox_corners(.6)[electrode_i[ends - 1]]
+        # Electrode only has one adjacent electrode, assume reservoir.
+        reservoir = shape_degrees[electrode_i[starts]] == 1
+
+        # Colors from ["Show me the numbers"][1].
+        #
+        # [1]: http://blog.axc.net/its-the-colors-you-have/
+        # LiteOrange = rgb(251,178,88);
+        # MedOrange = rgb(250,164,58);
+        # LiteGreen = rgb(144,205,151);
+        # MedGreen = rgb(96,189,104);
+        route_colors = ((~reservoir, np.array([96, 189, 104, 255]) / 255.),
+                        (reservoir, np.array([250, 164, 58, 255]) / 255.))
 
         cairo_context = cairo.Context(surface)
-        connections = self.device.df_shape_connections
-        for route_i, df_route in self.df_routes.groupby('route_i'):
-            source_id = df_route.electrode_i.iloc[0]
-            source_connections = connections.loc[(connections.source ==
-                                                  source_id) |
-                                                 (connections.target ==
-                                                  source_id)]
+        cairo_context.set_line_width(4)
+        for mask, color in route_colors:
+            if not mask.any():
+                continue
+            cairo_context.set_source_rgba(*color)
+            for start, end in zip(starts[mask], ends[mask]):
+                cairo_context.move_to(*centers[start])
+                for x, y in centers[start + 1:end]:
+                    cairo_context.line_to(x, y)
+            cairo_context.stroke()
 
-            # Colors from ["Show me the numbers"][1].
-            #
-            # [1]: http://blog.axc.net/its-the-colors-you-have/
-            # LiteOrange = rgb(251,178,88);
-            # MedOrange = rgb(250,164,58);
-            # LiteGreen = rgb(144,205,151);
-            # MedGreen = rgb(96,189,104);
-            if source_connections.shape[0] == 1:
-                # Electrode only has one adjacent electrode, assume reservoir.
-                color_rgb_255 = np.array([250, 164, 58, 255])
-            else:
-                color_rgb_255 = np.array([96, 189, 104, 255])
-            color = (color_rgb_255 / 255.).tolist()
-            self.draw_route(df_route, cairo_context, color=color,
-                            line_width=.25)
+            for marker in endpoint_markers[mask].tolist():
+                cairo_context.move_to(*marker[0])
+                for x, y in marker[1:]:
+                    cairo_context.line_to(x, y)
+                cairo_context.close_path()
+            cairo_context.fill()
+        return surface
+
+    def render_temporary_route(self):
+        '''
+        Render route currently being drawn with the mouse (i.e., between
+        mouse button press and release).
+
+        If an auto-route preview is set (see :meth:`set_route_preview()`), the
+        preview is drawn dashed instead.
+
+        See also :meth:`extend_temporary_route()`.
+
+
+        .. versionadded:: 0.16
+        '''
+        surface = self.get_surface()
+        if self._route_preview is not None:
+            self._stroke_route_points(surface,
+                                      self._route_points(self._route_preview),
+                                      dashed=True)
+        elif self._route is not None:
+            self._stroke_route_points(surface,
+                                      self._route_points(self._route
+                                                         .electrode_ids))
         return surface
 
+    def _route_points(self, electrode_ids):
+        if self.shape_geometry is None:
+            return []
+        return (self.shape_geometry.centers
+                [self.shape_geometry.indexes(electrode_ids)].tolist())
+
+    def _stroke_route_points(self, surface, points, dashed=False):
+        if len(points) < 2:
+            return
+        cairo_context = cairo.Context(surface)
+        self._set_temporary_route_style(cairo_context)
+        if dashed:
+            cairo_context.set_dash([8, 6])
+        cairo_context.move_to(*points[0])
+        for x, y in points[1:]:
+            cairo_context.line_to(x, y)
+        cairo_context.stroke()
+
+    def _set_temporary_route_style(self, cairo_context):
+        # MedGreen = rgb(96,189,104) (see :meth:`render_routes`).
+        cairo_context.set_source_rgba(96 / 255., 189 / 255., 104 / 255., .8)
+        cairo_context.set_line_width(4)
+        cairo_context.set_line_cap(cairo.LINE_CAP_ROUND)
+        cairo_context.set_line_join(cairo.LINE_JOIN_ROUND)
+
+    @staticmethod
+    def _points_region(points, padding=4):
+        '''
+        Returns
+        -------
+        tuple or None
+            Rectangle ``(x, y, width, height)`` containing ``points``, padded
+            by ``padding`` pixels, or ``None`` if ``points`` is empty.
+        '''
+        if not len(points):
+            return None
+        points = np.asarray(points)
+        x0, y0 = np.floor(points.min(axis=0)).astype(int) - padding
+        x1, y1 = np.ceil(points.max(axis=0)).astype(int) + padding + 1
+        return x0, y0, x1 - x0, y1 - y0
+
+    def get_route_tree(self):
+        '''
+        Returns
+        -------
+        dict or None
+            Shortest path predecessor tree rooted at pressed electrode (see
+            :func:`dmf_device_ui.topology.get_predecessors`), computed once
+            per button press, or ``None`` if no electrode is pressed or the
+            tree is still being computed.
+
+            Trees that are not cached are computed in a background thread
+            (see :meth:`PathCache.request_tree`), such that large devices do
+            not block the GTK main loop.  Once computed, the auto-route
+            preview to the hovered electrode is shown (see
+            :meth:`set_route_preview()`).
+
+
+        .. versionadded:: 0.16
+        '''
+        if self._route_tree is None and self.last_pressed is not None:
+            self._route_tree = \
+                self.path_cache.request_tree(self.last_pressed,
+                                             self._on_route_tree_computed)
+        return self._route_tree
+
+    def _on_route_tree_computed(self, source, predecessors):
+        # Called from path cache thread; apply tree on GTK main loop.
+        gobject.idle_add(self._set_route_tree, source, predecessors)
+
+    def _set_route_tree(self, source, predecessors):
+        if (self._route is not None and self._route_tree is None and
+                source == self.last_pressed):
+            self._route_tree = predecessors
+            if self.last_hovered is not None:
+                self.set_route_preview(walk_predecessors(predecessors,
+                                                         self.last_hovered))
+        # Remove idle callback.
+        return False
+
+    def set_route_preview(self, electrode_ids):
+        '''
+        Show auto-route preview (i.e., shortest path while ``<Alt>``-dragging)
+        on ``temporary_route`` layer, replacing any previous preview.
+
+        Only the regions covered by the previous and new previews are
+        re-composited and redrawn.
+
+        Parameters
+        ----------
+        electrode_ids : list or None
+            Electrode identifiers on previewed route, or ``None`` to clear
+            preview.
+
+        Returns
+        -------
+        tuple or None
+            Rectangle ``(x, y, width, height)`` of updated region, or ``None``
+            if nothing was drawn.
+
+
+        .. versionadded:: 0.16
+        '''
+        layer = 'temporary_route'
+        previous_points = (self._route_points(self._route_preview)
+                           if self._route_preview is not None else [])
+        self._route_preview = electrode_ids
+        if self.shape_geometry is None:
+            return None
+        if layer in self.stale_layers():
+            self.update_layers([layer])
+            self.cairo_surface = self.flatten_layers()
+            region = (0, 0) + tuple(self.get_surface_shape())
+        else:
+            points = (self._route_points(electrode_ids)
+                      if electrode_ids is not None else [])
+            regions = [region_i
+                       for region_i in (self._points_region(previous_points),
+                                        self._points_region(points))
+                       if region_i is not None]
+            if not regions:
+                return None
+            surface = self.df_surfaces.surface[layer]
+            cairo_context = cairo.Context(surface)
+            for x, y, width, height in regions:
+                cairo_context.rectangle(x, y, width, height)
+            cairo_context.set_operator(cairo.OPERATOR_CLEAR)
+            cairo_context.fill()
+            self._stroke_route_points(surface, points, dashed=True)
+            surface.flush()
+            self.invalidate_layer_groups(layer)
+
+            regions = np.array(regions)
+            x0, y0 = regions[:, :2].min(axis=0)
+            x1, y1 = (regions[:, :2] + regions[:, 2:]).max(axis=0)
+            region = (int(x0), int(y0), int(x1 - x0), int(y1 - y0))
+            self.flatten_region(*region)
+        self.request_redraw(region=region)
+        return region
+
+    def extend_temporary_route(self):
+        '''
+        Draw segment between the last two electrodes of the route currently
+        being drawn onto the ``temporary_route`` layer, re-composite, and
+        redraw the segment region.
+
+        Cost is independent of the length of the route and of the number of
+        committed routes (i.e., :attr:`df_routes` is not modified).
+
+        Returns
+        -------
+        tuple or None
+            Rectangle ``(x, y, width, height)`` of updated region, or ``None``
+            if nothing was drawn.
+
+
+        .. versionadded:: 0.16
+        '''
+        layer = 'temporary_route'
+        if (self._route is None or self.shape_geometry is None or
+                len(self._route.electrode_ids) < 2):
+            return None
+        if layer in self.stale_layers():
+            self.update_layers([layer])
+            self.cairo_surface = self.flatten_layers()
+            region = (0, 0) + tuple(self.get_surface_shape())
+        else:
+            surface = self.df_surfaces.surface[layer]
+            indexes = self.shape_geometry.indexes(self._route
+                                                  .electrode_ids[-2:])
+            if indexes.shape[0] < 2:
+                return None
+            (x1, y1), (x2, y2) = self.shape_geometry.centers[indexes].tolist()
+            cairo_context = cairo.Context(surface)
+            self._set_temporary_route_style(cairo_context)
+            cairo_context.move_to(x1, y1)
+            cairo_context.line_to(x2, y2)
+            cairo_context.stroke()
+            surface.flush()
+            self.invalidate_layer_groups(layer)
+
+            # Pad by line width.
+            x0, y0 = int(min(x1, x2)) - 4, int(min(y1, y2)) - 4
+            region = (x0, y0, int(max(x1, x2)) + 5 - x0,
+                      int(max(y1, y2)) + 5 - y0)
+            self.flatten_region(*region)
+        self.request_redraw(region=region)
+        return region
+
     def render_channel_labels(self, color_rgba=None):
         return self.render_labels(self.get_labels(), color_rgba=color_rgba)
 
@@ -809,37 +1981,654 @@ class DmfDeviceCanvas(GtkShapesCanvasView):
         cairo_context.stroke()
         return surface
 
-    def set_surface(self, name, surface):
+    def set_surface(self, name, surface, offset=None):
+        '''
+        .. versionchanged:: 0.16
+            Add ``offset`` argument, i.e., position of top-left corner of
+            surface on canvas (default: ``(0, 0)``).  Invalidate cached
+            flattened layer group containing layer (see
+            :meth:`flatten_layer_group()`), and release replaced surface of
+            rendered layer (see :attr:`layer_dependencies`) to surface pool
+            (see :meth:`release_surface()`).
+        '''
+        if name in self.layer_dependencies and name in self.df_surfaces.index:
+            previous_surface = self.df_surfaces.surface[name]
+            if previous_surface not in (None, surface):
+                self.release_surface(previous_surface)
         self.df_surfaces.loc[name, 'surface'] = surface
+        if offset is None:
+            self.layer_offsets.pop(name, None)
+        else:
+            self.layer_offsets[name] = offset
+        self.invalidate_layer_groups(name)
         self.emit('surface-rendered', name, surface)
 
     def set_surface_alpha(self, name, alpha):
+        '''
+        .. versionchanged:: 0.16
+            Invalidate cached flattened layer group containing layer (see
+            :meth:`flatten_layer_group()`).  Schedule redraw if layer was
+            skipped while hidden and is now visible, such that it is rebuilt
+            (see :meth:`hidden_layers()`).
+        '''
         if 'alpha' not in self.df_surfaces:
             self.df_surfaces['alpha'] = 1.
         if name in self.df_surfaces.index:
             self.df_surfaces.loc[name, 'alpha'] = alpha
+            self.invalidate_layer_groups(name)
+            if alpha > 0 and name in self.stale_layers():
+                self.request_redraw()
+
+    def set_surface_alphas(self, surface_alphas):
+        '''
+        Set opacity of multiple layers and schedule redraw.
+
+        Layer contents are **not** re-rendered; the layer stack is only
+        re-composited (see :meth:`request_redraw()`).
+
+        Parameters
+        ----------
+        surface_alphas : pandas.Series
+            Alpha of each layer, indexed by layer name.
+
+
+        .. versionadded:: 0.16
+        '''
+        for name, alpha in surface_alphas.iteritems():
+            self.set_surface_alpha(name, alpha)
+            self.request_redraw(alpha_layer=name)
+        self.emit('surfaces-reset', self.df_surfaces)
 
     def reorder_surfaces(self, surface_names):
+        '''
+        .. versionchanged:: 0.16
+            Invalidate all cached flattened layer groups (see
+            :meth:`flatten_layer_group()`).
+        '''
         assert(len(surface_names) == self.df_surfaces.shape[0])
         self.df_surfaces = self.df_surfaces.ix[surface_names]
+        self.invalidate_layer_groups()
         self.emit('surfaces-reset', self.df_surfaces)
-        self.cairo_surface = flatten_surfaces(self.df_surfaces)
+        self.cairo_surface = self.flatten_layers()
+
+    def compact_layer(self, name, surface):
+        '''
+        Convert rendered layer surface to storage format of layer (see
+        :attr:`layer_formats`).
+
+        Parameters
+        ----------
+        name : str
+            Name of layer.
+        surface : cairo.ImageSurface
+            Canvas sized ``FORMAT_ARGB32`` surface (released to surface pool
+            if converted).
+
+        Returns
+        -------
+        tuple
+            Layer surface and position of its top-left corner on canvas (or
+            ``None`` if surface is canvas sized).
+
+
+        .. versionadded:: 0.16
+        '''
+        layer_format = self.layer_formats.get(name)
+        if layer_format is None or surface.get_format() != \
+                cairo.FORMAT_ARGB32:
+            return surface, None
+        format_ = (cairo.FORMAT_A8 if layer_format.endswith('mask')
+                   else cairo.FORMAT_ARGB32)
+        if layer_format.startswith('cropped'):
+            bbox = get_content_bbox(surface)
+            if bbox is None:
+                # Empty layer.
+                bbox = (0, 0, 1, 1)
+        else:
+            bbox = (0, 0, surface.get_width(), surface.get_height())
+        # Canvas sized masks are reused from the surface pool.
+        compact_surface = crop_surface(surface, bbox, format_,
+                                       self.get_surface(format_, bbox[2:]))
+        self.release_surface(surface)
+        return compact_surface, (bbox[:2] if layer_format
+                                 .startswith('cropped') else None)
+
+    def paint_layer(self, cairo_context, name, surface, alpha=1.):
+        '''
+        Paint layer surface onto Cairo context.
+
+        ``FORMAT_A8`` surfaces are used as a mask for the layer tint color
+        (see :attr:`layer_tints`), and cropped surfaces are painted at their
+        offset (see :attr:`layer_offsets`).  Layers with an alpha of zero are
+        skipped.
+
+
+        .. versionadded:: 0.16
+        '''
+        if not alpha > 0:
+            return
+        x, y = self.layer_offsets.get(name, (0, 0))
+        if surface.get_format() == cairo.FORMAT_A8:
+            red, green, blue, tint_alpha = self.layer_tints.get(name, (1., 1.,
+                                                                       1., 1.))
+            cairo_context.set_source_rgba(red, green, blue, tint_alpha * alpha)
+            cairo_context.mask_surface(surface, x, y)
+        else:
+            cairo_context.set_source_surface(surface, x, y)
+            cairo_context.paint_with_alpha(alpha)
+
+    def flatten_layers(self, df_surfaces=None):
+        '''
+        Composite layers (in order) onto a new canvas sized surface.
+
+        Parameters
+        ----------
+        df_surfaces : pandas.DataFrame, optional
+            Layers to composite, with the columns ``surface`` and ``alpha``
+            (default: :attr:`df_surfaces`).
+
+        Returns
+        -------
+        cairo.ImageSurface
+
+
+        .. versionadded:: 0.16
+            Replaces :func:`cairo_helpers.surface.flatten_surfaces` to support
+            mask and cropped layers (see :attr:`layer_formats`).
+        '''
+        if df_surfaces is None:
+            df_surfaces = self.df_surfaces
+        surface = self.get_surface()
+        cairo_context = cairo.Context(surface)
+        for name, (surface_i, alpha_i) in zip(df_surfaces.index,
+                                              df_surfaces[['surface', 'alpha']]
+                                              .values):
+            self.paint_layer(cairo_context, name, surface_i, alpha_i)
+        return surface
+
+    @property
+    def layer_memory(self):
+        '''
+        Returns
+        -------
+        pandas.DataFrame
+            Table indexed by layer name, with the columns ``format``,
+            ``width``, ``height``, ``x``, ``y``, and ``bytes`` (i.e., size of
+            surface pixel buffer).
+
+
+        .. versionadded:: 0.16
+        '''
+        formats = {cairo.FORMAT_ARGB32: 'ARGB32', cairo.FORMAT_RGB24: 'RGB24',
+                   cairo.FORMAT_A8: 'A8'}
+        rows = []
+        for name, surface_i in self.df_surfaces.surface.iteritems():
+            x, y = self.layer_offsets.get(name, (0, 0))
+            rows.append([formats.get(surface_i.get_format()),
+                         surface_i.get_width(), surface_i.get_height(), x, y,
+                         surface_i.get_stride() * surface_i.get_height()])
+        return pd.DataFrame(rows, columns=['format', 'width', 'height', 'x',
+                                           'y', 'bytes'],
+                            index=pd.Index(self.df_surfaces.index,
+                                           name='name'))
+
+    def get_layer_group(self, name):
+        '''
+        Parameters
+        ----------
+        name : str
+            Name of layer.
+
+        Returns
+        -------
+        str or None
+            ``'below'`` or ``'above'`` if layer is below or above the
+            ``video`` layer, respectively.  ``None`` if there is no ``video``
+            layer, or if layer is the ``video`` layer.
+
+
+        .. versionadded:: 0.16
+        '''
+        names = self.df_surfaces.index
+        if 'video' not in names or name == 'video' or name not in names:
+            return None
+        return ('below' if names.get_loc(name) < names.get_loc('video')
+                else 'above')
+
+    def invalidate_layer_groups(self, name=None):
+        '''
+        Discard cached flattened layer group(s), releasing their surfaces to
+        the surface pool (see :meth:`release_surface()`).
+
+        Parameters
+        ----------
+        name : str, optional
+            Name of modified layer.  Only the group containing the layer is
+            discarded.  By default, discard all groups.
+
+
+        .. versionadded:: 0.16
+        '''
+        if name is None:
+            surfaces = self._layer_groups.values()
+            self._layer_groups = {}
+        else:
+            surfaces = [self._layer_groups.pop(self.get_layer_group(name),
+                                               None)]
+        if self._alpha_groups is not None and (name is None or
+                                               self._alpha_groups[0] != name):
+            surfaces.extend(self._alpha_groups[1:])
+            self._alpha_groups = None
+        # Return discarded flattened surfaces to surface pool.
+        for surface in surfaces:
+            if surface is not None:
+                self.release_surface(surface)
+
+    def flatten_alpha_change(self, name):
+        '''
+        Composite layer stack after changing the alpha of a single layer.
+
+        Layers below and above the layer are flattened once and cached until
+        another layer is modified (see :meth:`invalidate_layer_groups()`),
+        such that each alpha change (e.g., while dragging an opacity slider)
+        costs a blend of three surfaces, regardless of the number of layers.
+
+        Parameters
+        ----------
+        name : str
+            Name of layer.
+
+        Returns
+        -------
+        cairo.ImageSurface
+
+
+        .. versionadded:: 0.16
+        '''
+        if name not in self.df_surfaces.index:
+            return self.flatten_layers()
+        elif 'video' in self.df_surfaces.index:
+            # Layer groups are already cached around video layer.
+            return self.flatten_video_frame()
+        if self._alpha_groups is None or self._alpha_groups[0] != name:
+            if self._alpha_groups is not None:
+                for surface in self._alpha_groups[1:]:
+                    self.release_surface(surface)
+            i = self.df_surfaces.index.get_loc(name)
+            self._alpha_groups = (name,
+                                  self.flatten_layers(self.df_surfaces
+                                                      .iloc[:i]),
+                                  self.flatten_layers(self.df_surfaces
+                                                      .iloc[i + 1:]))
+        _, below, above = self._alpha_groups
+        surface = self.get_surface()
+        cairo_context = cairo.Context(surface)
+        cairo_context.set_source_surface(below, 0, 0)
+        cairo_context.paint()
+        surface_i, alpha_i = self.df_surfaces.loc[name, ['surface', 'alpha']]
+        self.paint_layer(cairo_context, name, surface_i, alpha_i)
+        cairo_context.set_source_surface(above, 0, 0)
+        cairo_context.paint()
+        return surface
+
+    def flatten_layer_group(self, group):
+        '''
+        Flatten layers below or above the ``video`` layer.
+
+        The flattened surface is cached until a layer in the group is modified
+        through :meth:`set_surface()` or :meth:`set_surface_alpha()`, or the
+        layers are reordered through :meth:`reorder_surfaces()`.
+
+        Parameters
+        ----------
+        group : str
+            Either ``'below'`` or ``'above'``.
+
+        Returns
+        -------
+        cairo.ImageSurface or None
+            Flattened layers, or ``None`` if group is empty.
+
+
+        .. versionadded:: 0.16
+        '''
+        if group not in self._layer_groups:
+            video_i = self.df_surfaces.index.get_loc('video')
+            if group == 'below':
+                df_group = self.df_surfaces.iloc[:video_i]
+            else:
+                df_group = self.df_surfaces.iloc[video_i + 1:]
+            self._layer_groups[group] = (self.flatten_layers(df_group)
+                                         if df_group.shape[0] else None)
+        return self._layer_groups[group]
+
+    def flatten_video_frame(self):
+        '''
+        Composite current ``video`` layer between cached flattened layer
+        groups (see :meth:`flatten_layer_group()`).
+
+        Each video frame costs a single blend of three surfaces, regardless
+        of the number of layers.
+
+        Returns
+        -------
+        cairo.ImageSurface
+
+
+        .. versionadded:: 0.16
+        '''
+        surface = self.get_surface()
+        cairo_context = cairo.Context(surface)
+        for surface_i, alpha_i in ((self.flatten_layer_group('below'), 1.),
+                                   tuple(self.df_surfaces.loc['video',
+                                                              ['surface',
+                                                               'alpha']]),
+                                   (self.flatten_layer_group('above'), 1.)):
+            if surface_i is None:
+                continue
+            cairo_context.set_source_surface(surface_i, 0, 0)
+            cairo_context.paint_with_alpha(alpha_i)
+        return surface
 
-    def render(self):
+    def flatten_region(self, x, y, width, height):
+        '''
+        Re-composite a rectangular region of the layer stack onto
+        :attr:`cairo_surface`.
+
+        See also :meth:`draw()`.
+
+
+        .. versionadded:: 0.16
+        '''
+        if self.cairo_surface is None:
+            self.cairo_surface = self.flatten_layers()
+            return
+        cairo_context = cairo.Context(self.cairo_surface)
+        cairo_context.rectangle(x, y, width, height)
+        cairo_context.clip()
+        cairo_context.set_operator(cairo.OPERATOR_CLEAR)
+        cairo_context.paint()
+        cairo_context.set_operator(cairo.OPERATOR_OVER)
+        for name, (surface_i, alpha_i) in \
+                zip(self.df_surfaces.index,
+                    self.df_surfaces[['surface', 'alpha']].values):
+            self.paint_layer(cairo_context, name, surface_i, alpha_i)
+
+    def render(self, force=False):
         '''
         .. versionchanged:: 0.12
             Add ``dynamic_electrode_state_shapes`` layer to show dynamic
             electrode actuations.
+
+        .. versionchanged:: 0.16
+            Only render layers with stale inputs (see :meth:`update_layers`),
+            unless ``force`` is ``True``.
         '''
         # Render each layer and update data frame with new content for each
         # surface.
-        surface_names = ('background', 'shapes', 'connections', 'routes',
-                         'channel_labels', 'static_electrode_state_shapes',
-                         'dynamic_electrode_state_shapes', 'registration')
-        for k in surface_names:
-            self.set_surface(k, getattr(self, 'render_' + k)())
+        self.update_layers(self.layer_dependencies.keys() if force else None)
         self.emit('surfaces-reset', self.df_surfaces)
-        self.cairo_surface = flatten_surfaces(self.df_surfaces)
+        self.cairo_surface = self.flatten_layers()
+
+    ###########################################################################
+    # Render graph
+    def invalidate(self, *inputs):
+        '''
+        Mark render inputs as modified.
+
+        Layers depending on any of the inputs (see
+        :attr:`layer_dependencies`) are rebuilt by the next call to
+        :meth:`update_layers()`.
+
+        Parameters
+        ----------
+        *inputs : str
+            Names of modified inputs (e.g., ``'electrode_states'``).
+
+
+        .. versionadded:: 0.16
+        '''
+        for input_i in inputs:
+            self._input_versions[input_i] += 1
+
+    def get_input_versions(self, name):
+        '''
+        Returns
+        -------
+        tuple
+            Current version of each input of layer ``name``.
+
+
+        .. versionadded:: 0.16
+        '''
+        return tuple(self._input_versions[k]
+                     for k in self.layer_dependencies[name])
+
+    def stale_layers(self):
+        '''
+        Returns
+        -------
+        list
+            Names of layers that have not been rendered since one of their
+            inputs was invalidated.
+
+
+        .. versionadded:: 0.16
+        '''
+        return [name for name in self.layer_dependencies
+                if self._layer_input_versions.get(name) !=
+                self.get_input_versions(name)]
+
+    def hidden_layers(self):
+        '''
+        Returns
+        -------
+        list
+            Names of layers that are not visible, i.e., with an alpha of zero
+            or not in the layer stack (:attr:`df_surfaces`).  Hidden layers
+            are not rendered (see :meth:`update_layers()`) or composited (see
+            :meth:`paint_layer()`).
+
+
+        .. versionadded:: 0.16
+        '''
+        return [name for name in self.layer_dependencies
+                if name not in self.df_surfaces.index or
+                not self.df_surfaces.alpha[name] > 0]
+
+    def layers_to_render(self):
+        '''
+        Returns
+        -------
+        list
+            Names of stale, visible layers without a pending render job for
+            their current inputs.
+
+
+        .. versionadded:: 0.16
+        '''
+        hidden_layers = self.hidden_layers()
+        return [name for name in self.stale_layers()
+                if name not in hidden_layers and
+                self._pending_layer_versions.get(name) !=
+                self.get_input_versions(name)]
+
+    def render_layer(self, name):
+        '''
+        Render layer and record the input versions it was rendered from.
+
+        Parameters
+        ----------
+        name : str
+            Name of layer (e.g., ``'routes'`` renders layer using
+            :meth:`render_routes()`).
+
+
+        .. versionadded:: 0.16
+        '''
+        input_versions = self.get_input_versions(name)
+        # Discard result of any pending render job for layer.
+        self._layer_generations[name] += 1
+        self._pending_layer_versions.pop(name, None)
+        surface, offset = self.compact_layer(name, getattr(self, 'render_' +
+                                                           name)())
+        self.set_surface(name, surface, offset)
+        self._layer_input_versions[name] = input_versions
+        self.layer_render_counts[name] += 1
+
+    def submit_layer(self, name):
+        '''
+        Render layer using :attr:`render_executor`.
+
+        Attributes read by the layer (see :attr:`render_inputs`) are
+        captured before the render job is submitted.  The rendered surface is swapped into :attr:`df_surfaces` on the GTK
+        main loop, unless the layer was rendered (or submitted) again in the
+        meantime.
+
+        Parameters
+        ----------
+        name : str
+            Name of layer.
+
+
+        .. versionadded:: 0.16
+        '''
+        self._layer_generations[name] += 1
+        generation = self._layer_generations[name]
+        input_versions = self.get_input_versions(name)
+        self._pending_layer_versions[name] = input_versions
+        shape = self.get_surface_shape()
+        # Snapshot render inputs on GTK main loop.
+        inputs = dict((k, getattr(self, k))
+                      for k in self.render_inputs.get(name, []))
+        self.render_executor.submit(self._render_layer_job,
+                                    ft.partial(self._on_layer_rendered, name,
+                                               generation, input_versions,
+                                               shape), name, shape, inputs)
+
+    def _render_layer_job(self, name, shape, inputs):
+        # Called in worker thread.
+        self._render_local.shape = shape
+        self._render_local.inputs = inputs
+        try:
+            return self.compact_layer(name, getattr(self, 'render_' + name)())
+        finally:
+            self._render_local.shape = None
+            self._render_local.inputs = None
+
+    def get_render_input(self, name):
+        '''
+        Parameters
+        ----------
+        name : str
+            Name of canvas attribute listed in :attr:`render_inputs`.
+
+        Returns
+        -------
+        object
+            Value of attribute captured when the layer being rendered in the
+            current render worker thread was submitted (see
+            :meth:`submit_layer`), or the current value of the attribute
+            when called on the GTK main loop.
+
+
+        .. versionadded:: 0.16
+        '''
+        inputs = getattr(self._render_local, 'inputs', None)
+        if inputs is not None and name in inputs:
+            return inputs[name]
+        return getattr(self, name)
+
+    def _on_layer_rendered(self, name, generation, input_versions, shape,
+                           result):
+        # Called on GTK main loop.
+        surface, offset = (None, None) if result is None else result
+        if (generation != self._layer_generations[name] or surface is None
+                or shape != self.get_surface_shape()):
+            # Render was superseded (or failed).
+            self.discarded_render_counts[name] += 1
+            if surface is not None:
+                self.release_surface(surface)
+            if self._pending_layer_versions.get(name) == input_versions:
+                del self._pending_layer_versions[name]
+            return
+        del self._pending_layer_versions[name]
+        self.set_surface(name, surface, offset)
+        self._layer_input_versions[name] = input_versions
+        self.layer_render_counts[name] += 1
+        self.request_redraw()
+
+    def update_layers(self, layers=None):
+        '''
+        Render layers with stale inputs.
+
+        If :attr:`render_executor` is set, :attr:`async_layers` are submitted
+        to the executor rather than rendered immediately (see
+        :meth:`submit_layer()`).  Hidden layers (see :meth:`hidden_layers()`)
+        are skipped, leaving them stale until they become visible.
+
+        Parameters
+        ----------
+        layers : list, optional
+            Names of layers to render (regardless of whether or not they are
+            stale).  By default, render all stale layers (except layers with
+            a pending render job for the current inputs).
+
+        Returns
+        -------
+        list
+            Names of layers rendered immediately.
+
+
+        .. versionadded:: 0.16
+        '''
+        if layers is None:
+            layers = self.layers_to_render()
+        else:
+            hidden_layers = self.hidden_layers()
+            layers = [name for name in layers if name not in hidden_layers]
+        rendered = []
+        for name in layers:
+            if self.render_executor is not None and name in self.async_layers:
+                self.submit_layer(name)
+            else:
+                self.render_layer(name)
+                rendered.append(name)
+        return rendered
+
+    @property
+    def render_graph(self):
+        '''
+        Returns
+        -------
+        pandas.DataFrame
+            Table indexed by layer name, with the columns:
+
+             - ``inputs``: inputs the layer depends on.
+             - ``stale``: ``True`` if layer requires rendering.
+             - ``render_count``: number of times layer has been rendered.
+             - ``pending``: ``True`` if a render job is pending for layer
+               (see :meth:`submit_layer()`).
+             - ``discarded_count``: number of superseded render jobs.
+             - ``hidden``: ``True`` if layer is not rendered because it is not
+               visible (see :meth:`hidden_layers()`).
+
+
+        .. versionadded:: 0.16
+        '''
+        stale_layers = self.stale_layers()
+        hidden_layers = self.hidden_layers()
+        return pd.DataFrame([[list(inputs), name in stale_layers,
+                              self.layer_render_counts[name],
+                              name in self._pending_layer_versions,
+                              self.discarded_render_counts[name],
+                              name in hidden_layers]
+                             for name, inputs in
+                             self.layer_dependencies.iteritems()],
+                            columns=['inputs', 'stale', 'render_count',
+                                     'pending', 'discarded_count', 'hidden'],
+                            index=pd.Index(self.layer_dependencies.keys(),
+                                           name='name'))
 
     ###########################################################################
     # Drawing helper methods
@@ -925,23 +2714,34 @@ class DmfDeviceCanvas(GtkShapesCanvasView):
         .. versionchanged:: 0.11
             Do not trigger `route-electrode-added` event if `ALT` key is
             pressed.
+
+        .. versionchanged:: 0.16
+            Clear ``temporary_route`` layer when starting a new route.  Compute
+            shortest path tree from pressed electrode if ``<Alt>`` key is held
+            down (see :meth:`get_route_tree()`).
         '''
         if self.mode == 'register_video' and event.button == 1:
             self.start_event = event.copy()
             return
         elif self.mode == 'control':
-            shape = self.canvas.find_shape(event.x, event.y)
+            shape = self.find_shape(event.x, event.y)
 
             if shape is None: return
             state = event.get_state()
             if event.button == 1:
                 # Start a new route.
-                self._route = Route(self.device)
+                self._route = Route(self.device, self.electrode_neighbours)
                 self._route.append(shape)
+                self._route_tree = None
+                self._route_preview = None
+                self.invalidate('temporary_route')
+                self.request_redraw(layers=['temporary_route'])
                 self.last_pressed = shape
                 if not (state & gtk.gdk.MOD1_MASK):
                     # `<Alt>` key is not held down.
                     self.emit('route-electrode-added', shape)
+                else:
+                    self.get_route_tree()
 
     def on_widget__button_release_event(self, widget, event):
         '''
@@ -954,6 +2754,10 @@ class DmfDeviceCanvas(GtkShapesCanvasView):
             table, and b) resetting the state of the current route electrode
             queue.  This fixes
             https://github.com/sci-bots/microdrop/issues/256.
+
+        .. versionchanged:: 0.16
+            Clear ``temporary_route`` layer and auto-route preview, rather than
+            removing temporary route rows from :attr:`df_routes`.
         '''
         event = event.copy()
         if self.mode == 'register_video' and (event.button == 1 and
@@ -963,13 +2767,11 @@ class DmfDeviceCanvas(GtkShapesCanvasView):
             self.start_event = None
             return
         elif self.mode == 'control':
-            # XXX Negative `route_i` corresponds to temporary route being
-            # drawn.  Since release of mouse button terminates route drawing,
-            # clear any rows corresponding to negative `route_i` values from
-            # the routes table.
-            self.df_routes = self.df_routes.loc[self.df_routes.route_i >=
-                                                0].copy()
-            shape = self.canvas.find_shape(event.x, event.y)
+            # Release of mouse button terminates route drawing, so clear
+            # temporary route layer.
+            self.invalidate('temporary_route')
+            self.request_redraw(layers=['temporary_route'])
+            shape = self.find_shape(event.x, event.y)
 
             if shape is not None:
                 electrode_data = {'electrode_id': shape, 'event': event.copy()}
@@ -1000,6 +2802,8 @@ class DmfDeviceCanvas(GtkShapesCanvasView):
                     menu.popup(None, None, None, event.button, event.time)
             # Clear route.
             self._route = None
+            self._route_tree = None
+            self._route_preview = None
 
     def create_context_menu(self, event, shape):
         '''
@@ -1115,6 +2919,12 @@ class DmfDeviceCanvas(GtkShapesCanvasView):
         .. versionchanged:: 0.11
             Do not trigger `route-electrode-added` event if `ALT` key is
             pressed.
+
+        .. versionchanged:: 0.16
+            Draw segment to hovered electrode on ``temporary_route`` layer (see
+            :meth:`extend_temporary_route()`).  Preview shortest path from
+            pressed electrode to hovered electrode if ``<Alt>`` key is held
+            down (see :meth:`set_route_preview()`).
         '''
         if self.canvas is None:
             # Canvas has not been initialized.  Nothing to do.
@@ -1125,7 +2935,7 @@ class DmfDeviceCanvas(GtkShapesCanvasView):
         else:
             x = event.x
             y = event.y
-        shape = self.canvas.find_shape(x, y)
+        shape = self.find_shape(x, y)
 
         # Grab focus to [enable notification on key press/release events][1].
         #
@@ -1144,9 +2954,20 @@ class DmfDeviceCanvas(GtkShapesCanvasView):
                 self.last_hovered = shape
 
                 if self._route is not None:
-                    if self._route.append(shape) and not (event.get_state() &
-                                                          gtk.gdk.MOD1_MASK):
-                        # `<Alt>` key was not held down.
+                    if event.get_state() & gtk.gdk.MOD1_MASK:
+                        # `<Alt>` key was held down, so preview shortest path
+                        # from pressed electrode.  Hovered electrodes are
+                        # *not* added to the route; the route is looked up in
+                        # the path cache on release (see
+                        # `electrode-pair-selected`).
+                        route_tree = self.get_route_tree()
+                        if route_tree is not None:
+                            # Otherwise, preview is shown once tree is
+                            # computed.
+                            self.set_route_preview(walk_predecessors
+                                                   (route_tree, shape))
+                    elif self._route.append(shape):
+                        self.extend_temporary_route()
                         self.emit('route-electrode-added', shape)
 
                 self.emit('electrode-mouseover', {'electrode_id':
@@ -1196,6 +3017,12 @@ class DmfDeviceCanvas(GtkShapesCanvasView):
         self.update_transforms()
 
     def on_frame_update(self, slave, np_frame):
+        '''
+        .. versionchanged:: 0.16
+            Composite video frame against cached flattened layer groups (see
+            :meth:`flatten_video_frame()`).  Draw scaled frame while canvas is
+            being resized (see :meth:`draw_provisional()`).
+        '''
         if self.widget.window is None:
             return
         if np_frame is None or not self._enabled:
@@ -1205,7 +3032,10 @@ class DmfDeviceCanvas(GtkShapesCanvasView):
         else:
             cr_warped, np_warped_view = np_to_cairo(np_frame)
             self.set_surface('video', cr_warped)
-        self.cairo_surface = flatten_surfaces(self.df_surfaces)
+        if 'video' in self.df_surfaces.index:
+            self.cairo_surface = self.flatten_video_frame()
+        else:
+            self.cairo_surface = self.flatten_layers()
         # Execute a few gtk main loop iterations to improve responsiveness when
         # using high video frame rates.
         #
@@ -1216,7 +3046,11 @@ class DmfDeviceCanvas(GtkShapesCanvasView):
                 break
             gtk.main_iteration_do()
 
-        self.draw()
+        if self._resize_size is not None:
+            # Canvas is being resized.
+            self.draw_provisional()
+        else:
+            self.draw()
     ###########################################################################
     # ## Electrode operation registration ##
     def register_global_command(self, command, title=None, group=None):
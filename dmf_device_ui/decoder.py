@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+'''
+Receive and decode subscription messages off the GTK main loop.
+
+.. versionadded:: 0.16
+'''
+from collections import deque
+import logging
+import threading
+
+import gobject
+import zmq
+
+logger = logging.getLogger(__name__)
+
+#: Message kinds made stale by a newer message of the key kind (see
+#: :meth:`MessageQueue.put`).
+SUPERSEDES = {'device': set(['device', 'routes', 'electrode_states_set',
+                             'electrode_states_packed',
+                             'electrode_states_updated']),
+              'routes': set(['routes']),
+              'electrode_states_set': set(['electrode_states_set',
+                                           'electrode_states_packed',
+                                           'electrode_states_updated']),
+              'electrode_states_packed': set(['electrode_states_set',
+                                              'electrode_states_packed',
+                                              'electrode_states_updated'])}
+
+
+class MessageQueue(object):
+    '''
+    Bounded, thread-safe queue of decoded ``(kind, data)`` messages.
+
+    Parameters
+    ----------
+    max_size : int, optional
+        Maximum number of queued messages.
+    overflow : str, optional
+        Action taken when putting a message in a full queue:
+
+         - ``'drop_stale'``: discard queued messages made stale by the new
+           message (see :data:`SUPERSEDES`), e.g., electrode state snapshots
+           replaced by a newer snapshot; block if no queued messages are
+           stale.
+         - ``'drop_oldest'``: discard oldest queued message.
+         - ``'block'``: wait until messages are consumed.
+
+    Attributes
+    ----------
+    dropped_count : int
+        Number of messages discarded due to overflow.
+    '''
+    overflow_policies = ('drop_stale', 'drop_oldest', 'block')
+
+    def __init__(self, max_size=64, overflow='drop_stale'):
+        if overflow not in self.overflow_policies:
+            raise ValueError('Overflow policy must be one of: %s' %
+                             ', '.join(self.overflow_policies))
+        self.max_size = max_size
+        self.overflow = overflow
+        self.dropped_count = 0
+        self.closed = False
+        self._messages = deque()
+        self._condition = threading.Condition()
+
+    def __len__(self):
+        return len(self._messages)
+
+    def put(self, message):
+        '''
+        Parameters
+        ----------
+        message : tuple
+            ``(kind, data)`` message.
+
+        Returns
+        -------
+        bool
+            ``True`` if message was queued, ``False`` if queue was closed.
+        '''
+        with self._condition:
+            if len(self._messages) >= self.max_size:
+                if self.overflow == 'drop_oldest':
+                    self._messages.popleft()
+                    self.dropped_count += 1
+                elif self.overflow == 'drop_stale':
+                    self._drop_stale(message[0])
+            while len(self._messages) >= self.max_size and not self.closed:
+                self._condition.wait()
+            if self.closed:
+                return False
+            self._messages.append(message)
+            return True
+
+    def _drop_stale(self, kind):
+        stale_kinds = SUPERSEDES.get(kind)
+        if not stale_kinds:
+            return
+        messages = deque(message_i for message_i in self._messages
+                         if message_i[0] not in stale_kinds)
+        self.dropped_count += len(self._messages) - len(messages)
+        self._messages = messages
+
+    def get_all(self):
+        '''
+        Returns
+        -------
+        list
+            All queued messages, oldest first (queue is emptied).
+        '''
+        with self._condition:
+            messages = list(self._messages)
+            self._messages.clear()
+            self._condition.notify_all()
+        return messages
+
+    def close(self):
+        '''
+        Discard queued messages and wake any blocked :meth:`put` call.
+        '''
+        with self._condition:
+            self.closed = True
+            self._messages.clear()
+            self._condition.notify_all()
+
+
+class SubscribeDecoder(object):
+    '''
+    Thread receiving and decoding messages from a ZeroMQ subscription socket.
+
+    Decoded messages are queued in a :class:`MessageQueue` and passed, in
+    batches, to a callback *on the GTK main loop* (through
+    :func:`gobject.idle_add`).
+
+    .. note::
+        ZeroMQ sockets are not thread-safe.  While the decoder is running,
+        ``socket`` must not be used by any other thread.
+
+    Parameters
+    ----------
+    socket : zmq.Socket
+        Subscription socket.
+    decode : function
+        Function called in decoder thread with message frames, returning a
+        decoded ``(kind, data)`` message or ``None`` to skip message.
+    callback : function
+        Function called on GTK main loop with list of decoded messages.
+    max_queue_size : int, optional
+        Maximum number of decoded messages waiting for GTK main loop.
+    overflow : str, optional
+        Queue overflow policy (see :class:`MessageQueue`).
+    poll_timeout_ms : int, optional
+        Maximum time (in milliseconds) between checks for stop request.
+
+    Attributes
+    ----------
+    queue : MessageQueue
+        Decoded messages waiting for GTK main loop.
+    decoded_count : int
+        Number of messages decoded.
+    '''
+    def __init__(self, socket, decode, callback, max_queue_size=64,
+                 overflow='drop_stale', poll_timeout_ms=100):
+        # Allow decoder thread to run while GTK main loop is running.
+        gobject.threads_init()
+        self.socket = socket
+        self.decode = decode
+        self.callback = callback
+        self.poll_timeout_ms = poll_timeout_ms
+        self.queue = MessageQueue(max_queue_size, overflow)
+        self.decoded_count = 0
+        self._idle_lock = threading.Lock()
+        self._idle_source_id = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run,
+                                        name='subscribe-decoder')
+        self._thread.daemon = True
+
+    def __repr__(self):
+        return ('<SubscribeDecoder decoded=%d queued=%d dropped=%d>' %
+                (self.decoded_count, len(self.queue),
+                 self.queue.dropped_count))
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self, timeout_s=1.):
+        '''
+        Stop decoder thread, discarding any queued messages.
+
+        Parameters
+        ----------
+        timeout_s : float, optional
+            Maximum time (in seconds) to wait for decoder thread to exit.
+        '''
+        self._stop.set()
+        self.queue.close()
+        if self._thread.is_alive():
+            self._thread.join(timeout_s)
+        with self._idle_lock:
+            if self._idle_source_id is not None:
+                gobject.source_remove(self._idle_source_id)
+                self._idle_source_id = None
+
+    def _run(self):
+        poller = zmq.Poller()
+        poller.register(self.socket, zmq.POLLIN)
+        while not self._stop.is_set():
+            try:
+                if not poller.poll(self.poll_timeout_ms):
+                    continue
+                msg_frames = self.socket.recv_multipart(zmq.NOBLOCK)
+            except zmq.Again:
+                continue
+            except zmq.ZMQError:
+                if not self._stop.is_set():
+                    logger.error('Error receiving message.', exc_info=True)
+                break
+            try:
+                message = self.decode(msg_frames)
+            except Exception:
+                logger.error('Error decoding message.', exc_info=True)
+                continue
+            self.decoded_count += 1
+            if message is not None and self.queue.put(message):
+                self._schedule()
+
+    def _schedule(self):
+        with self._idle_lock:
+            if self._idle_source_id is None and not self._stop.is_set():
+                self._idle_source_id = gobject.idle_add(self._on_idle)
+
+    def _on_idle(self):
+        with self._idle_lock:
+            # Messages queued from now on schedule a new idle callback.
+            self._idle_source_id = None
+        messages = self.queue.get_all()
+        if messages:
+            try:
+                self.callback(messages)
+            except Exception:
+                logger.error('Error applying decoded messages.',
+                             exc_info=True)
+        # Remove idle callback.
+        return False
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+'''
+Thread pool for rendering canvas layers off the GTK main loop.
+
+.. versionadded:: 0.16
+'''
+import logging
+import Queue
+import threading
+
+import gobject
+
+logger = logging.getLogger(__name__)
+
+
+class RenderExecutor(object):
+    '''
+    Pool of worker threads.
+
+    Each job is called in a worker thread and its result is passed to the
+    job callback *on the GTK main loop* (through :func:`gobject.idle_add`).
+
+    Parameters
+    ----------
+    worker_count : int, optional
+        Number of worker threads.
+
+    Attributes
+    ----------
+    submitted_count : int
+        Number of jobs submitted.
+    completed_count : int
+        Number of jobs completed (including failed jobs).
+    '''
+    def __init__(self, worker_count=2):
+        # Allow worker threads to run while GTK main loop is running.
+        gobject.threads_init()
+        self.submitted_count = 0
+        self.completed_count = 0
+        self._jobs = Queue.Queue()
+        self._threads = []
+        for i in xrange(worker_count):
+            thread = threading.Thread(target=self._run,
+                                      name='render-worker-%d' % i)
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def __repr__(self):
+        return ('<RenderExecutor workers=%d submitted=%d completed=%d>' %
+                (len(self._threads), self.submitted_count,
+                 self.completed_count))
+
+    def submit(self, func, callback, *args):
+        '''
+        Parameters
+        ----------
+        func : function
+            Function to call in worker thread with ``args``.
+        callback : function
+            Function to call on GTK main loop with result of ``func``, or
+            ``None`` if ``func`` raised an exception.
+        *args
+            Arguments to ``func``.
+        '''
+        self.submitted_count += 1
+        self._jobs.put((func, args, callback))
+
+    def shutdown(self):
+        '''
+        Stop worker threads once queued jobs have been processed.
+        '''
+        for thread in self._threads:
+            self._jobs.put(None)
+        self._threads = []
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+            func, args, callback = job
+            try:
+                result = func(*args)
+            except Exception:
+                logger.error('Error running render job.', exc_info=True)
+                result = None
+            gobject.idle_add(self._complete, callback, result)
+
+    def _complete(self, callback, result):
+        self.completed_count += 1
+        callback(result)
+        # Remove idle callback.
+        return False
@@ -0,0 +1,566 @@
+# -*- coding: utf-8 -*-
+'''
+Precompiled electrode shape geometry.
+
+.. versionadded:: 0.16
+'''
+import logging
+import threading
+
+import cairo
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class ShapeGeometry(object):
+    '''
+    Flat vertex arrays (and corresponding Cairo paths) for a set of polygon
+    shapes.
+
+    Built once per device and canvas size, such that rendering does not
+    require any :class:`pandas.DataFrame` operations.
+
+    Attributes
+    ----------
+    shape_ids : numpy.ndarray
+        Shape identifiers, sorted.
+    index : dict
+        Mapping from shape identifier to position in :attr:`shape_ids`.
+    vertices : numpy.ndarray
+        ``(n_vertices, 2)`` array of vertex coordinates, grouped by shape.
+    offsets : numpy.ndarray
+        Vertices of shape ``i`` are ``vertices[offsets[i]:offsets[i + 1]]``.
+    bbox_min, bbox_max : numpy.ndarray
+        ``(n_shapes, 2)`` arrays of bounding box corners of each shape.
+    centers : numpy.ndarray
+        ``(n_shapes, 2)`` array of shape centers (i.e., center of bounding
+        box, consistent with :func:`svg_model.compute_shape_centers`).
+    center_offsets : numpy.ndarray
+        ``(n_vertices, 2)`` array of vertex offsets from shape center.
+    '''
+    def __init__(self, shape_ids, vertices, offsets, centers=None,
+                 index=None):
+        self.shape_ids = np.asarray(shape_ids)
+        if index is None:
+            index = dict((shape_id, i)
+                         for i, shape_id in enumerate(self.shape_ids))
+        self.index = index
+        self.vertices = np.asarray(vertices, dtype=float)
+        self.offsets = np.asarray(offsets, dtype=int)
+        starts = self.offsets[:-1]
+        self.counts = np.diff(self.offsets)
+        self.bbox_min = np.minimum.reduceat(self.vertices, starts, axis=0)
+        self.bbox_max = np.maximum.reduceat(self.vertices, starts, axis=0)
+        if centers is None:
+            centers = .5 * (self.bbox_min + self.bbox_max)
+        self.centers = np.asarray(centers, dtype=float)
+        self.center_offsets = (self.vertices -
+                               np.repeat(self.centers, self.counts, axis=0))
+        # Cairo paths and bounding box corners, keyed by shape scale.  Caches
+        # are filled under a lock, since geometry may be shared by render
+        # worker threads.
+        self._paths = {}
+        self._bbox_corners = {}
+        self._cache_lock = threading.Lock()
+
+    @classmethod
+    def from_frame(cls, df_shapes, shape_i_column='id'):
+        '''
+        Parameters
+        ----------
+        df_shapes : pandas.DataFrame
+            Table with one row per polygon vertex, containing at least the
+            columns ``shape_i_column``, ``vertex_i``, ``x``, and ``y``.
+        shape_i_column : str, optional
+            Name of shape identifier column.
+
+        Returns
+        -------
+        ShapeGeometry
+        '''
+        df_shapes = df_shapes.sort_values([shape_i_column, 'vertex_i'])
+        ids = df_shapes[shape_i_column].values
+        starts = np.r_[0, np.flatnonzero(ids[1:] != ids[:-1]) + 1]
+        offsets = np.r_[starts, ids.shape[0]]
+        return cls(ids[starts], df_shapes[['x', 'y']].values, offsets)
+
+    def __len__(self):
+        return self.shape_ids.shape[0]
+
+    def transform(self, matrix):
+        '''
+        Map geometry through an affine transformation.
+
+        Shape centers are mapped directly (rather than recomputed from the
+        transformed vertices), since bounding box centers are preserved by
+        the scale and translation used to fit shapes to the canvas.
+
+        Parameters
+        ----------
+        matrix : array-like
+            ``3x3`` affine transformation matrix (e.g.,
+            ``ShapesCanvas.shapes_to_canvas_transform``).
+
+        Returns
+        -------
+        ShapeGeometry
+            Transformed geometry.
+        '''
+        matrix = np.asarray(matrix, dtype=float)
+        linear, offset = matrix[:2, :2].T, matrix[:2, 2]
+        return ShapeGeometry(self.shape_ids,
+                             self.vertices.dot(linear) + offset, self.offsets,
+                             centers=self.centers.dot(linear) + offset,
+                             index=self.index)
+
+    def indexes(self, shape_ids):
+        '''
+        Parameters
+        ----------
+        shape_ids : list-like
+            Shape identifiers.  Identifiers not in the geometry are ignored.
+
+        Returns
+        -------
+        numpy.ndarray
+            Position of each (known) shape in :attr:`shape_ids`.
+        '''
+        index = self.index
+        return np.array([index[i] for i in shape_ids if i in index],
+                        dtype=int)
+
+    def scaled_vertices(self, scale=1.):
+        '''
+        Returns
+        -------
+        numpy.ndarray
+            Vertices with each shape scaled by ``scale`` about its center.
+        '''
+        if scale == 1:
+            return self.vertices
+        return (np.repeat(self.centers, self.counts, axis=0) +
+                scale * self.center_offsets)
+
+    def bbox_corners(self, scale=1.):
+        '''
+        Parameters
+        ----------
+        scale : float, optional
+            Scale of each bounding box about its shape center.
+
+        Returns
+        -------
+        numpy.ndarray
+            ``(n_shapes, 4, 2)`` array of bounding box corners of each shape,
+            in the order top-left, bottom-left, bottom-right, top-right.
+        '''
+        with self._cache_lock:
+            if scale not in self._bbox_corners:
+                self._bbox_corners[scale] = self._get_bbox_corners(scale)
+            return self._bbox_corners[scale]
+
+    def _get_bbox_corners(self, scale):
+        x_min, y_min = (self.bbox_min - self.centers).T
+        x_max, y_max = (self.bbox_max - self.centers).T
+        corners = np.dstack([[x_min, x_min, x_max, x_max],
+                             [y_min, y_max, y_max, y_min]])
+        return self.centers[:, None, :] + scale * corners.transpose(1, 0, 2)
+
+    def paths(self, scale=1.):
+        '''
+        Parameters
+        ----------
+        scale : float, optional
+            Scale of each shape about its center.
+
+        Returns
+        -------
+        list
+            One :class:`cairo.Path` per shape, ready to be appended to a
+            Cairo context with :meth:`cairo.Context.append_path`.
+        '''
+        with self._cache_lock:
+            if scale not in self._paths:
+                self._paths[scale] = self._get_paths(scale)
+            return self._paths[scale]
+
+    def _get_paths(self, scale):
+        # Cairo paths may only be created through a context, so trace each
+        # shape on a scratch context and copy the resulting path.
+        context = cairo.Context(cairo.ImageSurface(cairo.FORMAT_ARGB32, 1, 1))
+        vertices = self.scaled_vertices(scale).tolist()
+        paths = []
+        for start, end in zip(self.offsets[:-1], self.offsets[1:]):
+            context.new_path()
+            context.move_to(*vertices[start])
+            for x, y in vertices[start + 1:end]:
+                context.line_to(x, y)
+            context.close_path()
+            paths.append(context.copy_path())
+        return paths
+
+    def append_paths(self, cairo_context, indexes=None, scale=1.):
+        '''
+        Append paths of selected shapes to the current path of a Cairo
+        context.
+
+        Parameters
+        ----------
+        cairo_context : cairo.Context
+        indexes : list-like, optional
+            Positions of shapes to append.  By default, append all shapes.
+        scale : float, optional
+            Scale of each shape about its center.
+        '''
+        paths = self.paths(scale)
+        if indexes is None:
+            indexes = xrange(len(paths))
+        for i in indexes:
+            cairo_context.append_path(paths[i])
+
+
+def point_in_polygon(vertices, x, y):
+    '''
+    Parameters
+    ----------
+    vertices : list
+        List of ``(x, y)`` polygon vertex coordinates.
+    x, y : float
+        Coordinates of point.
+
+    Returns
+    -------
+    bool
+        ``True`` if point is inside polygon (even-odd rule).
+    '''
+    inside = False
+    x1, y1 = vertices[-1]
+    for x2, y2 in vertices:
+        if (y2 > y) != (y1 > y) and x < (x1 - x2) * (y - y2) / (y1 - y2) + x2:
+            inside = not inside
+        x1, y1 = x2, y2
+    return inside
+
+
+class ShapeGrid(object):
+    '''
+    Uniform grid spatial index over the shapes of a :class:`ShapeGeometry`.
+
+    Each grid cell lists the shapes whose bounding box overlaps the cell, so
+    finding the shape containing a point only requires point-in-polygon tests
+    against the (few) shapes in a single cell.
+
+    Parameters
+    ----------
+    geometry : ShapeGeometry
+    cell_size : float, optional
+        Width and height of each grid cell.  By default, use the median shape
+        bounding box size (i.e., roughly one shape per cell).
+    '''
+    def __init__(self, geometry, cell_size=None):
+        self.geometry = geometry
+        if cell_size is None:
+            cell_size = np.median(geometry.bbox_max - geometry.bbox_min)
+        self.cell_size = max(float(cell_size), 1.)
+        self.origin = geometry.bbox_min.min(axis=0)
+
+        self.polygons = [geometry.vertices[start:end].tolist()
+                         for start, end in zip(geometry.offsets[:-1],
+                                               geometry.offsets[1:])]
+        self.bboxes = np.hstack([geometry.bbox_min,
+                                 geometry.bbox_max]).tolist()
+        cells_min = self.get_cells(geometry.bbox_min)
+        cells_max = self.get_cells(geometry.bbox_max)
+        self.cells = {}
+        for i, ((x0, y0), (x1, y1)) in enumerate(zip(cells_min.tolist(),
+                                                     cells_max.tolist())):
+            for cell_x in xrange(x0, x1 + 1):
+                for cell_y in xrange(y0, y1 + 1):
+                    self.cells.setdefault((cell_x, cell_y), []).append(i)
+
+    def get_cells(self, points):
+        '''
+        Parameters
+        ----------
+        points : numpy.ndarray
+            ``(n, 2)`` array of point coordinates.
+
+        Returns
+        -------
+        numpy.ndarray
+            ``(n, 2)`` array of grid cell coordinates containing each point.
+        '''
+        return np.floor((points - self.origin) /
+                        self.cell_size).astype(int)
+
+    def find_shape_index(self, x, y):
+        '''
+        Returns
+        -------
+        int or None
+            Position (in geometry) of shape containing point, or ``None`` if
+            point is not inside any shape.
+        '''
+        cell = (int(np.floor((x - self.origin[0]) / self.cell_size)),
+                int(np.floor((y - self.origin[1]) / self.cell_size)))
+        for i in self.cells.get(cell, []):
+            x_min, y_min, x_max, y_max = self.bboxes[i]
+            if (x_min <= x <= x_max and y_min <= y <= y_max and
+                    point_in_polygon(self.polygons[i], x, y)):
+                return i
+        return None
+
+    def find_shape(self, x, y):
+        '''
+        Returns
+        -------
+        object or None
+            Identifier of shape containing point, or ``None`` if point is not
+            inside any shape.
+        '''
+        i = self.find_shape_index(x, y)
+        return None if i is None else self.geometry.shape_ids[i]
+
+
+class LabelImage(object):
+    '''
+    Raster image of the shapes of a :class:`ShapeGeometry`, where each pixel
+    holds the (1-based) position of the shape covering it (``0`` for
+    background).
+
+    Shapes may be drawn to a ``FORMAT_ARGB32`` surface of the same size
+    using a lookup table gather (i.e., ``lut[labels]``), independent of the
+    number of shape vertices.
+
+    Parameters
+    ----------
+    geometry : ShapeGeometry
+    width, height : int
+        Size of image (in pixels).
+    scale : float, optional
+        Scale of each shape about its center.
+
+    Attributes
+    ----------
+    labels : numpy.ndarray
+        Flat array of labels, laid out like the pixels of an ``ARGB32``
+        surface of the same size (i.e., including any row padding).  Labels
+        are ``uint16`` for fewer than 65535 shapes (``int32`` otherwise).
+    windows : numpy.ndarray
+        ``(n_shapes, 4)`` array of pixel bounding box ``(x0, y0, x1, y1)`` of
+        each shape (``x1`` and ``y1`` exclusive), used to find the pixels of a
+        shape without scanning the whole image.
+    '''
+    def __init__(self, geometry, width, height, scale=1.):
+        self.geometry = geometry
+        self.width = width
+        self.height = height
+        self.scale = scale
+
+        # Paint each shape (without anti-aliasing) using its label as color.
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, height)
+        cairo_context = cairo.Context(surface)
+        cairo_context.set_antialias(cairo.ANTIALIAS_NONE)
+        for i, path_i in enumerate(geometry.paths(scale)):
+            label = i + 1
+            cairo_context.append_path(path_i)
+            cairo_context.set_source_rgb(((label >> 16) & 0xff) / 255.,
+                                         ((label >> 8) & 0xff) / 255.,
+                                         (label & 0xff) / 255.)
+            cairo_context.fill()
+        surface.flush()
+        self.stride = surface.get_stride()
+        dtype = np.uint16 if len(geometry) < 0xffff else np.int32
+        self.labels = (get_pixels(surface) & 0xffffff).astype(dtype)
+
+        # Pixel bounding box of each (scaled) shape, padded by one pixel.
+        bbox_min = geometry.centers + scale * (geometry.bbox_min -
+                                               geometry.centers)
+        bbox_max = geometry.centers + scale * (geometry.bbox_max -
+                                               geometry.centers)
+        windows = np.hstack([np.floor(bbox_min) - 1, np.ceil(bbox_max) + 2])
+        self.windows = np.clip(windows, 0,
+                               [width, height, width, height]).astype(int)
+
+    @property
+    def labels_2d(self):
+        '''
+        Returns
+        -------
+        numpy.ndarray
+            ``(height, row length)`` view of :attr:`labels`.
+        '''
+        return self.labels.reshape(self.height, -1)
+
+    def lookup(self, x, y):
+        '''
+        Returns
+        -------
+        int or None
+            Position (in geometry) of shape covering pixel ``(x, y)``, or
+            ``None`` if pixel is background or outside image.
+        '''
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return None
+        label = int(self.labels_2d[int(y), int(x)])
+        return label - 1 if label else None
+
+    def mask(self, i):
+        '''
+        Returns
+        -------
+        numpy.ndarray
+            Flat indexes of pixels covered by shape at position ``i``.
+        '''
+        x0, y0, x1, y1 = self.windows[i]
+        labels = self.labels_2d
+        rows, columns = np.nonzero(labels[y0:y1, x0:x1] == i + 1)
+        return (rows + y0) * labels.shape[1] + columns + x0
+
+    def render(self, surface, indexes, color):
+        '''
+        Draw selected shapes filled with a color (all other pixels are
+        cleared).
+
+        Parameters
+        ----------
+        surface : cairo.ImageSurface
+            ``FORMAT_ARGB32`` surface with the same size as the label image.
+        indexes : list-like
+            Positions of shapes to draw.
+        color : tuple
+            RGB or RGBA fill color.
+        '''
+        lut = np.zeros(len(self.geometry) + 1, dtype=np.uint32)
+        lut[np.asarray(indexes, dtype=int) + 1] = to_argb32(color)
+        surface.flush()
+        get_pixels(surface)[:] = lut[self.labels]
+        surface.mark_dirty()
+
+    def fill(self, surface, indexes, color):
+        '''
+        Fill the pixels of selected shapes with a color, leaving all other
+        pixels untouched.
+
+        Parameters
+        ----------
+        surface : cairo.ImageSurface
+            ``FORMAT_ARGB32`` surface with the same size as the label image.
+        indexes : list-like
+            Positions of shapes to fill.
+        color : tuple
+            RGB or RGBA fill color (use ``(0, 0, 0, 0)`` to clear).
+        '''
+        if not len(indexes):
+            return
+        surface.flush()
+        pixels = get_pixels(surface).reshape(self.height, -1)
+        labels = self.labels_2d
+        value = to_argb32(color)
+        for i in indexes:
+            x0, y0, x1, y1 = self.windows[i]
+            window = pixels[y0:y1, x0:x1]
+            window[labels[y0:y1, x0:x1] == i + 1] = value
+        surface.mark_dirty()
+
+    @property
+    def nbytes(self):
+        '''
+        Returns
+        -------
+        int
+            Memory used by label image (in bytes).
+        '''
+        return self.labels.nbytes + self.windows.nbytes
+
+
+def get_pixels(surface):
+    '''
+    Returns
+    -------
+    numpy.ndarray
+        Flat ``uint32`` view of pixel buffer of ``FORMAT_ARGB32`` surface.
+    '''
+    return np.frombuffer(surface.get_data(), dtype=np.uint32)
+
+
+def get_content_bbox(surface):
+    '''
+    Parameters
+    ----------
+    surface : cairo.ImageSurface
+        ``FORMAT_ARGB32`` or ``FORMAT_A8`` surface.
+
+    Returns
+    -------
+    tuple or None
+        Bounding box ``(x, y, width, height)`` of non-transparent pixels, or
+        ``None`` if surface is fully transparent.
+    '''
+    surface.flush()
+    width, height = surface.get_width(), surface.get_height()
+    data = np.frombuffer(surface.get_data(),
+                         dtype=np.uint8).reshape(height, surface.get_stride())
+    if surface.get_format() == cairo.FORMAT_A8:
+        opaque = data[:, :width] > 0
+    else:
+        # Pixels are pre-multiplied, so transparent pixels are zero.
+        opaque = data.view(np.uint32)[:, :width] > 0
+    rows = np.flatnonzero(opaque.any(axis=1))
+    if not rows.shape[0]:
+        return None
+    columns = np.flatnonzero(opaque[rows[0]:rows[-1] + 1].any(axis=0))
+    return (int(columns[0]), int(rows[0]), int(columns[-1] - columns[0] + 1),
+            int(rows[-1] - rows[0] + 1))
+
+
+def crop_surface(surface, bbox, format_=cairo.FORMAT_ARGB32, target=None):
+    '''
+    Parameters
+    ----------
+    surface : cairo.ImageSurface
+        Source surface.
+    bbox : tuple
+        Region ``(x, y, width, height)`` of ``surface`` to copy.
+    format_ : int, optional
+        Format of cropped surface (e.g., ``cairo.FORMAT_A8`` to only keep
+        alpha channel).
+    target : cairo.ImageSurface, optional
+        Surface of format ``format_`` and size of ``bbox`` to copy region
+        into (e.g., from a surface pool).  By default, a new surface is
+        allocated.
+
+    Returns
+    -------
+    cairo.ImageSurface
+        Copy of region of ``surface``.
+    '''
+    x, y, width, height = bbox
+    cropped = (cairo.ImageSurface(format_, width, height) if target is None
+               else target)
+    cairo_context = cairo.Context(cropped)
+    cairo_context.set_operator(cairo.OPERATOR_SOURCE)
+    cairo_context.set_source_surface(surface, -x, -y)
+    cairo_context.paint()
+    return cropped
+
+
+def to_argb32(color):
+    '''
+    Parameters
+    ----------
+    color : tuple
+        RGB or RGBA color, with each channel in the range ``[0, 1]``.
+
+    Returns
+    -------
+    numpy.uint32
+        Pre-multiplied, native-endian ``FORMAT_ARGB32`` pixel value.
+    '''
+    red, green, blue = color[:3]
+    alpha = color[3] if len(color) > 3 else 1.
+    channels = np.round(np.array([alpha, red * alpha, green * alpha,
+                                  blue * alpha]) * 255).astype(np.uint32)
+    return np.uint32((channels[0] << 24) | (channels[1] << 16) |
+                     (channels[2] << 8) | channels[3])
@@ -1,6 +1,11 @@
 # -*- coding: utf-8 -*-
+from collections import Counter
+import base64
 import json
 import logging
+import sys
+import threading
+import time
 
 from logging_helpers import _L
 from pygtkhelpers.delegates import SlaveView
@@ -9,9 +14,12 @@ from zmq_plugin.plugin import Plugin
 from zmq_plugin.schema import decode_content_data
 import gobject
 import gtk
+import pandas as pd
 import zmq
 
 from . import generate_plugin_name
+from .decoder import SubscribeDecoder
+from .states import STATE_ENCODINGS
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +27,33 @@ logger = logging.getLogger(__name__)
 class DevicePlugin(Plugin):
     def __init__(self, parent, *args, **kwargs):
         self.parent = parent
+        #: .. versionadded:: 0.16
+        #:     Maximum time (in seconds) spent processing messages per wake up
+        #:     of the message pump (see :meth:`start_message_pump`).
+        self.time_budget_s = .02
+        self._pump_source_ids = []
+        self._drain_source_id = None
+        #: .. versionadded:: 0.16
+        #:     Number of subscription messages received and number of
+        #:     (coalesced) updates applied (see :meth:`apply_messages`).
+        #:     Messages may be counted from :attr:`decoder` thread, so
+        #:     counts are only modified while holding
+        #:     :attr:`message_counts_lock`.
+        self.message_counts = Counter()
+        self.message_counts_lock = threading.Lock()
+        #: .. versionadded:: 0.16
+        #:     Subscription decoder thread (see :meth:`start_decoder`).
+        self.decoder = None
+        #: .. versionadded:: 0.16
+        #:     Electrode state format requested from electrode controller
+        #:     (``'json'``, ``'bitmask'``, or ``'uint8'``; see
+        #:     :meth:`negotiate_state_format`).
+        self.requested_state_format = 'json'
+        #: .. versionadded:: 0.16
+        #:     Electrode state format accepted by electrode controller.  Binary
+        #:     electrode states are only decoded while a binary format is
+        #:     accepted (see :meth:`apply_packed_states`).
+        self.state_format = 'json'
         super(DevicePlugin, self).__init__(*args, **kwargs)
 
     def check_sockets(self):
@@ -38,6 +73,10 @@ class DevicePlugin(Plugin):
         .. versionchanged:: 0.13
             Update local global, electrode, and route command lists in response
             to ``microdrop.command_plugin`` messages.
+
+        .. versionchanged:: 0.16
+            Process subscription messages using :meth:`on_subscribe_recv`.
+            Subscription socket is skipped while :attr:`decoder` is running.
         '''
         try:
             msg_frames = (self.command_socket
@@ -47,78 +86,634 @@ class DevicePlugin(Plugin):
         else:
             self.on_command_recv(msg_frames)
 
+        if self.decoder is not None:
+            return True
+
         try:
             msg_frames = (self.subscribe_socket
                           .recv_multipart(zmq.NOBLOCK))
-            source, target, msg_type, msg_json = msg_frames
-
-            if ((source == 'microdrop.device_info_plugin') and
-                (msg_type == 'execute_reply')):
-                msg = json.loads(msg_json)
-                if msg['content']['command'] == 'get_device':
-                    data = decode_content_data(msg)
-                    if data is not None:
-                        self.parent.on_device_loaded(data)
-            elif ((source == 'microdrop.electrode_controller_plugin') and
-                (msg_type == 'execute_reply')):
-                msg = json.loads(msg_json)
-                if msg['content']['command'] in ('set_electrode_state',
-                                                 'set_electrode_states'):
-                    data = decode_content_data(msg)
-                    if data is None:
-                        print msg
-                    else:
-                        #self.emit('electrode-states-updated', data)
-                        self.parent.on_electrode_states_updated(data)
-                elif msg['content']['command'] == 'get_channel_states':
-                    data = decode_content_data(msg)
-                    if data is None:
-                        print msg
-                    else:
-                        #self.emit('electrode-states-set', data)
-                        self.parent.on_electrode_states_set(data)
-            elif ((source == 'droplet_planning_plugin') and
-                  (msg_type == 'execute_reply')):
-                msg = json.loads(msg_json)
-                if msg['content']['command'] in ('add_route', ):
-                    self.execute_async('droplet_planning_plugin',
-                                       'get_routes')
-                elif msg['content']['command'] in ('get_routes', ):
-                    data = decode_content_data(msg)
-                    self.parent.canvas_slave.df_routes = data
-            elif ((source == 'microdrop.command_plugin') and
-                  (msg_type == 'execute_reply')):
-                msg = json.loads(msg_json)
-
-                if msg['content']['command'] in ('get_commands',
-                                                 'unregister_command',
-                                                 'register_command'):
-                    df_commands = decode_content_data(msg).set_index('namespace')
-
-                    for group_i, df_i in df_commands.groupby('namespace'):
-                        register = getattr(self.parent.canvas_slave,
-                                           'register_%s_command' % group_i,
-                                           None)
-                        if register is None:
-                            continue
-                        else:
-                            for j, command_ij in df_i.iterrows():
-                                register(command_ij.command_name,
-                                         title=command_ij.title,
-                                         group=command_ij.plugin_name)
-                                _L().debug('registered %s command: `%s`',
-                                           group_i, command_ij)
-            else:
-                self.most_recent = msg_json
         except zmq.Again:
             pass
+        else:
+            self.on_subscribe_recv(msg_frames)
+
+        return True
+
+    def on_subscribe_recv(self, msg_frames):
+        '''
+        Process message received on subscription socket.
+
+
+        .. versionadded:: 0.16
+            Refactored from :meth:`check_sockets`.
+        '''
+        try:
+            message = self.decode_subscribe_msg(msg_frames)
         except:
             logger.error('Error processing message from subscription '
                          'socket.', exc_info=True)
+        else:
+            if message is not None:
+                self.apply_messages([message])
+
+    def decode_subscribe_msg(self, msg_frames):
+        '''
+        Decode message received on subscription socket.
+
+        Parameters
+        ----------
+        msg_frames : list
+            Message frames, i.e., source, target, message type, and message
+            JSON.
+
+        Returns
+        -------
+        tuple or None
+            Message kind and decoded data (see :meth:`apply_messages`), or
+            ``None`` if message is not handled.
+
+
+        .. versionadded:: 0.16
+            Refactored from :meth:`check_sockets`.
+        '''
+        source, target, msg_type, msg_json = msg_frames
+        with self.message_counts_lock:
+            self.message_counts['received'] += 1
+
+        if ((source == 'microdrop.device_info_plugin') and
+            (msg_type == 'execute_reply')):
+            msg = json.loads(msg_json)
+            if msg['content']['command'] == 'get_device':
+                data = decode_content_data(msg)
+                if data is not None:
+                    return 'device', data
+        elif ((source == 'microdrop.electrode_controller_plugin') and
+            (msg_type == 'execute_reply')):
+            msg = json.loads(msg_json)
+            if msg['content']['command'] in ('set_electrode_state',
+                                             'set_electrode_states'):
+                data = decode_content_data(msg)
+                if data is None:
+                    logger.debug('No data in reply: %s', msg)
+                elif 'electrode_states_packed' in data:
+                    # Binary states include *all* electrodes.
+                    return ('electrode_states_packed',
+                            base64.b64decode(data['electrode_states_packed']))
+                else:
+                    return 'electrode_states_updated', data
+            elif msg['content']['command'] == 'get_channel_states':
+                data = decode_content_data(msg)
+                if data is None:
+                    logger.debug('No data in reply: %s', msg)
+                elif 'electrode_states_packed' in data:
+                    return ('electrode_states_packed',
+                            base64.b64decode(data['electrode_states_packed']))
+                else:
+                    return 'electrode_states_set', data
+        elif ((source == 'droplet_planning_plugin') and
+              (msg_type == 'execute_reply')):
+            msg = json.loads(msg_json)
+            if msg['content']['command'] in ('add_route', ):
+                return 'route_added', None
+            elif msg['content']['command'] in ('get_routes', ):
+                return 'routes', decode_content_data(msg)
+        elif ((source == 'microdrop.command_plugin') and
+              (msg_type == 'execute_reply')):
+            msg = json.loads(msg_json)
+
+            if msg['content']['command'] in ('get_commands',
+                                             'unregister_command',
+                                             'register_command'):
+                return 'commands', decode_content_data(msg)
+        else:
+            self.most_recent = msg_json
+        return None
+
+    def unpack_states(self, packed_states):
+        '''
+        Decode binary electrode states (see :meth:`negotiate_state_format`).
+
+        Must be called on the GTK main loop, since states are decoded against
+        the electrode state store of the current device.
+
+        Parameters
+        ----------
+        packed_states : str
+            Output of :func:`dmf_device_ui.states.pack_electrode_states`.
+
+        Returns
+        -------
+        ElectrodeStates or None
+            Decoded states, or ``None`` if states do not match the current
+            device.
+
+
+        .. versionadded:: 0.16
+        '''
+        store = self.parent.canvas_slave.electrode_state_store
+        try:
+            return store.unpack(packed_states)
+        except ValueError:
+            # States were encoded for a different (e.g., previous) device.
+            logger.warning('Skipping binary electrode states.', exc_info=True)
+            return None
+
+    def apply_packed_states(self, packed_states, states_updated=None):
+        '''
+        Set electrode states from binary states, merged with any subsequent
+        state updates.
+
+        Binary states are skipped unless a binary format has been accepted by
+        the electrode controller (see :attr:`state_format`).  Binary states
+        that do not match the current device cause a fall back to JSON states
+        (see :meth:`fall_back_to_json_states`).
+
+        Parameters
+        ----------
+        packed_states : str
+            Binary states (see :meth:`unpack_states`).
+        states_updated : pandas.Series, optional
+            Electrode states updated after binary states were sent.
+
+
+        .. versionadded:: 0.16
+        '''
+        if self.state_format == 'json':
+            logger.debug('Skipping binary electrode states (binary format not '
+                         'accepted).')
+            states = None
+        else:
+            states = self.unpack_states(packed_states)
+            if states is None:
+                self.fall_back_to_json_states()
+        if states is None:
+            if states_updated is not None:
+                self.parent.on_electrode_states_updated({'electrode_states':
+                                                         states_updated})
+            return
+        if states_updated is not None:
+            states.update(states_updated)
+        self.parent.on_electrode_states_set({'electrode_states': states})
+
+    def apply_messages(self, messages):
+        '''
+        Apply net result of decoded subscription messages.
+
+        Messages of the same kind are coalesced, such that each kind is
+        applied at most once:
+
+         - ``device``: only the most recent device is loaded (states and
+           routes received before it are discarded).
+         - ``commands``: command tables are combined and registered once.
+         - ``routes``: only the most recent routes table is applied.
+         - ``route_added``: routes are requested once.
+         - ``electrode_states_set``/``electrode_states_packed``/
+           ``electrode_states_updated``: state updates are merged into the
+           most recent full set of states (if any) and applied with a single
+           canvas update.  Binary (i.e., packed) states are decoded here, on
+           the GTK main loop (see :meth:`apply_packed_states`).
+
+        Parameters
+        ----------
+        messages : list
+            ``(kind, data)`` tuples (see :meth:`decode_subscribe_msg`).
+
+
+        .. versionadded:: 0.16
+        '''
+        device = None
+        df_commands = []
+        routes = None
+        route_added = False
+        states_set = None
+        states_packed = None
+        states_updated = None
+
+        for kind, data in messages:
+            if kind == 'device':
+                device = data
+                routes = states_set = states_packed = states_updated = None
+            elif kind == 'commands':
+                df_commands.append(data)
+            elif kind == 'routes':
+                routes = data
+            elif kind == 'route_added':
+                route_added = True
+            elif kind == 'electrode_states_set':
+                states_set = data['electrode_states']
+                states_packed = states_updated = None
+            elif kind == 'electrode_states_packed':
+                states_packed = data
+                states_set = states_updated = None
+            elif kind == 'electrode_states_updated':
+                states = data['electrode_states']
+                states_updated = (states if states_updated is None
+                                  else states.combine_first(states_updated))
+
+        applied = []
+        if device is not None:
+            applied.append((self.parent.on_device_loaded, device))
+        if df_commands:
+            df_commands = (pd.concat(df_commands, ignore_index=True)
+                           .drop_duplicates().set_index('namespace'))
+            applied.append((self.register_commands, df_commands))
+        if routes is not None:
+            applied.append((setattr, self.parent.canvas_slave, 'df_routes',
+                            routes))
+        if route_added:
+            applied.append((self.execute_async, 'droplet_planning_plugin',
+                            'get_routes'))
+        if states_packed is not None:
+            # Decode after any device in batch is loaded.
+            applied.append((self.apply_packed_states, states_packed,
+                            states_updated))
+        elif states_set is not None:
+            if states_updated is not None:
+                states_set = states_updated.combine_first(states_set)
+            applied.append((self.parent.on_electrode_states_set,
+                            {'electrode_states': states_set}))
+        elif states_updated is not None:
+            applied.append((self.parent.on_electrode_states_updated,
+                            {'electrode_states': states_updated}))
+
+        for args in applied:
+            with self.message_counts_lock:
+                self.message_counts['applied'] += 1
+            try:
+                args[0](*args[1:])
+            except:
+                logger.error('Error applying message.', exc_info=True)
+
+    def register_commands(self, df_commands):
+        '''
+        Register global, electrode, and route commands with canvas.
+
+        Parameters
+        ----------
+        df_commands : pandas.DataFrame
+            Commands table, indexed by namespace (e.g., ``'electrode'``), with
+            the columns ``command_name``, ``title``, and ``plugin_name``.
+
+
+        .. versionadded:: 0.16
+            Refactored from :meth:`check_sockets`.
+        '''
+        for group_i, df_i in df_commands.groupby(level='namespace'):
+            register = getattr(self.parent.canvas_slave,
+                               'register_%s_command' % group_i, None)
+            if register is None:
+                continue
+            else:
+                for j, command_ij in df_i.iterrows():
+                    register(command_ij.command_name, title=command_ij.title,
+                             group=command_ij.plugin_name)
+                    _L().debug('registered %s command: `%s`', group_i,
+                               command_ij)
+
+    @property
+    def message_stats(self):
+        '''
+        Returns
+        -------
+        pandas.Series
+            Number of subscription messages received, number of (coalesced)
+            updates applied (see :meth:`apply_messages`), and number of
+            messages dropped by :attr:`decoder` due to queue overflow.
+
+
+        .. versionadded:: 0.16
+        '''
+        dropped = (0 if self.decoder is None
+                   else self.decoder.queue.dropped_count)
+        with self.message_counts_lock:
+            counts = [self.message_counts['received'],
+                      self.message_counts['applied'], dropped]
+        return pd.Series(counts, index=['received', 'applied', 'dropped'])
+
+    def drain_sockets(self, time_budget_s=None):
+        '''
+        Process all pending messages on command and subscription sockets.
+
+        Subscription messages received during a call are coalesced and
+        applied together (see :meth:`apply_messages`).  The subscription
+        socket is skipped while :attr:`decoder` is running.
+
+        Parameters
+        ----------
+        time_budget_s : float, optional
+            Maximum time (in seconds) to spend processing messages (default:
+            :attr:`time_budget_s`).
+
+        Returns
+        -------
+        bool
+            ``True`` if messages may still be pending (i.e., time budget was
+            exceeded or messages arrived while processing).
+
+
+        .. versionadded:: 0.16
+        '''
+        if time_budget_s is None:
+            time_budget_s = self.time_budget_s
+        start = time.time()
+        messages = []
+        sockets = [self.command_socket]
+        if self.decoder is None:
+            sockets.append(self.subscribe_socket)
+        try:
+            while True:
+                received = False
+                for socket in sockets:
+                    try:
+                        msg_frames = socket.recv_multipart(zmq.NOBLOCK)
+                    except zmq.Again:
+                        continue
+                    received = True
+                    try:
+                        if socket is self.command_socket:
+                            self.on_command_recv(msg_frames)
+                        else:
+                            message = self.decode_subscribe_msg(msg_frames)
+                            if message is not None:
+                                messages.append(message)
+                    except Exception:
+                        logger.error('Error processing message.',
+                                     exc_info=True)
+                if not received:
+                    break
+                elif time.time() - start > time_budget_s:
+                    return True
+        finally:
+            if messages:
+                self.apply_messages(messages)
+        # Messages may have arrived (or been requested by applied messages)
+        # since sockets were last read.
+        return self.messages_pending()
+
+    def messages_pending(self):
+        '''
+        Check for pending messages on sockets watched by message pump.
+
+        Reading ``zmq.EVENTS`` also re-arms the edge-triggered ``zmq.FD``
+        notification of each socket, such that messages arriving later wake
+        up the message pump (see :meth:`start_message_pump`).
+
+        Returns
+        -------
+        bool
+            ``True`` if a message is waiting on the command socket or (if
+            :attr:`decoder` is not running) the subscription socket.
+
+
+        .. versionadded:: 0.16
+        '''
+        sockets = [self.command_socket]
+        if self.decoder is None:
+            sockets.append(self.subscribe_socket)
+        return any([socket.getsockopt(zmq.EVENTS) & zmq.POLLIN
+                    for socket in sockets])
+
+    def start_message_pump(self, poll_interval_ms=25):
+        '''
+        Process socket messages as they arrive on the GTK main loop.
+
+        The file descriptor of each socket (i.e., ``zmq.FD``) is watched using
+        :func:`gobject.io_add_watch`.  On each wake up, all pending messages
+        are processed, up to :attr:`time_budget_s` seconds; remaining
+        messages are processed in an idle callback.
+
+        Since ``zmq.FD`` is edge-triggered, using a socket (e.g., sending a
+        request with :meth:`execute_async`) may consume the notification for
+        messages already queued.  Pending messages are therefore checked
+        (see :meth:`messages_pending`) after each request and after sockets
+        are drained; no timer runs while there is no traffic.
+
+        On Windows, where socket handles cannot be watched by the GTK main
+        loop, sockets are drained every ``poll_interval_ms`` milliseconds.
+
+        If :attr:`decoder` is running, the subscription socket is not watched
+        (see :meth:`start_decoder`).
+
+
+        .. versionadded:: 0.16
+        '''
+        self.stop_message_pump()
+        if sys.platform == 'win32':
+            self._pump_source_ids = [gobject.timeout_add(poll_interval_ms,
+                                                         self._on_pump_wakeup)]
+            return
+        sockets = [self.command_socket]
+        if self.decoder is None:
+            sockets.append(self.subscribe_socket)
+        for socket in sockets:
+            self._pump_source_ids.append(
+                gobject.io_add_watch(socket.getsockopt(zmq.FD),
+                                     gobject.IO_IN | gobject.IO_ERR,
+                                     self._on_socket_event, socket))
+        # Process messages queued before sockets were watched.
+        self._check_pending_messages()
+
+    def stop_message_pump(self):
+        '''
+        .. versionadded:: 0.16
+        '''
+        for source_id in self._pump_source_ids:
+            gobject.source_remove(source_id)
+        self._pump_source_ids = []
+        if self._drain_source_id is not None:
+            gobject.source_remove(self._drain_source_id)
+            self._drain_source_id = None
+
+    def start_decoder(self, max_queue_size=64, overflow='drop_stale'):
+        '''
+        Receive and decode subscription messages in a background thread.
+
+        Decoded messages (e.g., devices and electrode states, which are
+        decoded to :mod:`pandas` objects) are applied on the GTK main loop
+        in batches (see :meth:`apply_messages`), such that decoding large
+        payloads does not block drawing.
+
+        Must be called *before* :meth:`start_message_pump`, since the
+        subscription socket is owned by the decoder thread while it is
+        running.
+
+        Parameters
+        ----------
+        max_queue_size : int, optional
+            Maximum number of decoded messages waiting to be applied.
+        overflow : str, optional
+            Action taken when queue is full (see
+            :class:`dmf_device_ui.decoder.MessageQueue`), e.g.,
+            ``'drop_stale'`` to discard electrode state snapshots replaced by
+            a newer snapshot.
+
+
+        .. versionadded:: 0.16
+        '''
+        self.stop_decoder()
+        self.decoder = SubscribeDecoder(self.subscribe_socket,
+                                        self.decode_subscribe_msg,
+                                        self.apply_messages,
+                                        max_queue_size=max_queue_size,
+                                        overflow=overflow)
+        self.decoder.start()
+
+    def stop_decoder(self):
+        '''
+        .. versionadded:: 0.16
+        '''
+        if self.decoder is not None:
+            self.decoder.stop()
+            self.decoder = None
+
+    def execute_async(self, *args, **kwargs):
+        '''
+        .. versionadded:: 0.16
+            Check for pending messages after sending request (see
+            :meth:`start_message_pump`).
+        '''
+        try:
+            return super(DevicePlugin, self).execute_async(*args, **kwargs)
+        finally:
+            self._check_pending_messages()
+
+    def execute(self, *args, **kwargs):
+        '''
+        .. versionadded:: 0.16
+            Check for pending messages after request completes (see
+            :meth:`start_message_pump`).
+        '''
+        try:
+            return super(DevicePlugin, self).execute(*args, **kwargs)
+        finally:
+            self._check_pending_messages()
+
+    def _check_pending_messages(self):
+        if self._pump_source_ids and self.messages_pending():
+            self._schedule_drain()
+
+    def _schedule_drain(self):
+        if self._drain_source_id is None:
+            self._drain_source_id = gobject.idle_add(self._on_drain_idle)
+
+    def _on_socket_event(self, fd, condition, socket):
+        if socket.getsockopt(zmq.EVENTS) & zmq.POLLIN:
+            self._on_pump_wakeup()
+        # Keep watching socket.
+        return True
 
+    def _on_pump_wakeup(self):
+        if self._drain_source_id is None and self.drain_sockets():
+            # Time budget exceeded or messages arrived while processing;
+            # process remaining messages when idle.
+            self._schedule_drain()
         return True
 
+    def _on_drain_idle(self):
+        if self.drain_sockets():
+            return True
+        self._drain_source_id = None
+        return False
+
+    def negotiate_state_format(self, encoding='bitmask'):
+        '''
+        Request electrode states from electrode controller in compact binary
+        format (see :func:`dmf_device_ui.states.pack_electrode_states`).
+
+        Binary states are ordered by device electrode index (i.e.,
+        ``DmfDevice.shape_indexes``, see
+        :attr:`DmfDeviceCanvas.electrode_state_store`) and include a device
+        hash, such that states encoded for a different device or electrode
+        order are rejected.  The electrode identifiers are sent, in order,
+        along with the hash, so the controller does not need to derive the
+        order itself.
+
+        Binary states are only decoded once the electrode controller has
+        accepted the format (see :attr:`state_format`).  If the electrode
+        controller does not support the requested format, states continue to
+        be received as JSON-encoded :class:`pandas.Series`.  If binary states
+        do not match the current device, JSON states are restored (see
+        :meth:`fall_back_to_json_states`) until the format is renegotiated
+        by the next :meth:`request_refresh` (i.e., when a device is loaded).
+
+        The electrode controller ``set_state_format`` command must:
+
+         - accept the keyword arguments ``encoding`` (``'bitmask'``,
+           ``'uint8'``, or ``'json'``), ``device_hash`` (base64-encoded
+           output of :func:`dmf_device_ui.states.get_device_hash`),
+           ``electrode_count``, and ``electrode_ids`` (in device electrode
+           index order);
+         - reply without error to accept the format, or raise an error to
+           reject it;
+         - once a binary format is accepted, reply to ``get_channel_states``,
+           ``set_electrode_state``, and ``set_electrode_states`` with
+           ``{'electrode_states_packed': <base64 states>}``, where
+           ``<base64 states>`` is the base64-encoded output of
+           :func:`dmf_device_ui.states.pack_electrode_states` for the state
+           of *every* electrode in ``electrode_ids`` order;
+         - restore JSON-encoded replies when ``encoding`` is ``'json'``.
+
+        Parameters
+        ----------
+        encoding : str, optional
+            ``'bitmask'``, ``'uint8'``, or ``'json'``.
+
+
+        .. versionadded:: 0.16
+        '''
+        if encoding != 'json' and encoding not in STATE_ENCODINGS:
+            raise ValueError('Encoding must be one of: json, %s' %
+                             ', '.join(sorted(STATE_ENCODINGS)))
+        self.requested_state_format = encoding
+        store = self.parent.canvas_slave.electrode_state_store
+
+        def on_reply(reply):
+            try:
+                decode_content_data(reply)
+            except Exception:
+                logger.info('Electrode controller does not support `%s` '
+                            'electrode states; using JSON states.', encoding)
+                self.state_format = 'json'
+            else:
+                self.state_format = encoding
+                if encoding != 'json':
+                    # Binary states received before format was accepted were
+                    # skipped; request a full set of binary states.
+                    self.execute_async('microdrop.electrode_controller_plugin',
+                                       'get_channel_states')
+
+        self.execute_async('microdrop.electrode_controller_plugin',
+                           'set_state_format', encoding=encoding,
+                           device_hash=base64.b64encode(store.device_hash),
+                           electrode_count=len(store),
+                           electrode_ids=store.electrode_ids.tolist(),
+                           callback=on_reply)
+
+    def fall_back_to_json_states(self):
+        '''
+        Restore JSON-encoded electrode states, e.g., after receiving binary
+        states that do not match the current device, and request a full set
+        of (JSON) electrode states.
+
+
+        .. versionadded:: 0.16
+        '''
+        logger.info('Falling back to JSON electrode states.')
+        self.state_format = 'json'
+        self.execute_async('microdrop.electrode_controller_plugin',
+                           'set_state_format', encoding='json')
+        self.execute_async('microdrop.electrode_controller_plugin',
+                           'get_channel_states')
+
     def request_refresh(self):
+        '''
+        .. versionchanged:: 0.16
+            Renegotiate binary electrode state format (see
+            :meth:`negotiate_state_format`), since device hash changes with
+            device.
+        '''
+        if self.requested_state_format != 'json':
+            self.negotiate_state_format(self.requested_state_format)
         # Request electrode/channel states.
         self.execute_async('microdrop.electrode_controller_plugin',
                            'get_channel_states')
@@ -208,14 +803,90 @@ class DevicePlugin(Plugin):
         '''
         .. versionchanged:: 0.12
             Queue redraw after setting surface alphas.
+
+        .. versionchanged:: 0.16
+            Re-composite layers without re-rendering layer contents (see
+            :meth:`DmfDeviceCanvas.set_surface_alphas`) and schedule redraw
+            using :meth:`DmfDeviceCanvas.request_redraw`.
         '''
         data = decode_content_data(request)
         logger.debug('[on_execute__set_surface_alphas] %s',
                      data['surface_alphas'])
-        for name, alpha in data['surface_alphas'].iteritems():
-            self.parent.canvas_slave.set_surface_alpha(name, alpha)
-        self.parent.canvas_slave.render()
-        gobject.idle_add(self.parent.canvas_slave.draw)
+        self.parent.canvas_slave.set_surface_alphas(data['surface_alphas'])
+
+    def on_execute__get_render_graph(self, request):
+        '''
+        .. versionadded:: 0.16
+
+        Returns
+        -------
+        pandas.DataFrame
+            Inputs, stale status, and render count of each canvas layer (see
+            :attr:`DmfDeviceCanvas.render_graph`).
+        '''
+        return self.parent.canvas_slave.render_graph
+
+    def on_execute__get_redraw_stats(self, request):
+        '''
+        .. versionadded:: 0.16
+
+        Returns
+        -------
+        pandas.Series
+            Number of redraws requested and executed (see
+            :attr:`DmfDeviceCanvas.redraw_stats`).
+        '''
+        return self.parent.canvas_slave.redraw_stats
+
+    def on_execute__get_surface_pool_stats(self, request):
+        '''
+        .. versionadded:: 0.16
+
+        Returns
+        -------
+        pandas.Series
+            Surface allocation and pool statistics (see
+            :attr:`DmfDeviceCanvas.surface_pool_stats`).
+        '''
+        return self.parent.canvas_slave.surface_pool_stats
+
+    def on_execute__check_redraw_allocations(self, request):
+        '''
+        .. versionadded:: 0.16
+
+        Returns
+        -------
+        int
+            Number of surfaces allocated by a repeated update of every
+            canvas layer (see
+            :meth:`DmfDeviceCanvas.check_redraw_allocations`); should be
+            zero.
+        '''
+        return self.parent.canvas_slave.check_redraw_allocations()
+
+    def on_execute__get_layer_memory(self, request):
+        '''
+        .. versionadded:: 0.16
+
+        Returns
+        -------
+        pandas.DataFrame
+            Format, size, offset, and pixel buffer size (in bytes) of each
+            canvas layer surface (see :attr:`DmfDeviceCanvas.layer_memory`).
+        '''
+        return self.parent.canvas_slave.layer_memory
+
+    def on_execute__get_message_stats(self, request):
+        '''
+        .. versionadded:: 0.16
+
+        Returns
+        -------
+        pandas.Series
+            Number of subscription messages received and applied (see
+            :attr:`message_stats`).
+        '''
+        return self.message_stats
 
     def on_execute__set_dynamic_electrode_states(self, request):
         '''
@@ -0,0 +1,356 @@
+# -*- coding: utf-8 -*-
+'''
+Array-backed electrode state store and compact binary state encoding.
+
+.. versionadded:: 0.16
+'''
+import hashlib
+import logging
+import struct
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+#: Binary state encodings (see :func:`pack_electrode_states`).
+STATE_ENCODINGS = {'uint8': 0, 'bitmask': 1}
+#: Header of binary states: magic, version, encoding, device hash, and
+#: electrode count.
+STATE_HEADER = struct.Struct('<2sBB8sI')
+STATE_MAGIC = 'ES'
+STATE_VERSION = 1
+
+
+def get_device_hash(electrode_ids):
+    '''
+    Parameters
+    ----------
+    electrode_ids : list-like
+        Electrode identifiers, in device electrode index order (i.e., sorted
+        by ``DmfDevice.shape_indexes``).
+
+    Returns
+    -------
+    str
+        8-byte digest identifying electrodes *and* their order, used to
+        verify that binary states match the electrode order of the receiver.
+    '''
+    return hashlib.sha1('\n'.join(map(str, electrode_ids))).digest()[:8]
+
+
+def pack_electrode_states(values, device_hash, encoding='bitmask'):
+    '''
+    Encode electrode states as a binary string.
+
+    Parameters
+    ----------
+    values : numpy.ndarray
+        State of every electrode, in device order (non-zero is actuated).
+    device_hash : str
+        Device hash (see :func:`get_device_hash`).
+    encoding : str, optional
+        ``'bitmask'`` (one bit per electrode) or ``'uint8'`` (one byte per
+        electrode).
+
+    Returns
+    -------
+    str
+        Header (see :data:`STATE_HEADER`) followed by encoded states.
+    '''
+    values = (np.asarray(values) > 0).astype(np.uint8)
+    if encoding == 'bitmask':
+        payload = np.packbits(values)
+    elif encoding == 'uint8':
+        payload = values
+    else:
+        raise ValueError('Encoding must be one of: %s' %
+                         ', '.join(sorted(STATE_ENCODINGS)))
+    return (STATE_HEADER.pack(STATE_MAGIC, STATE_VERSION,
+                              STATE_ENCODINGS[encoding], device_hash,
+                              values.shape[0]) + payload.tostring())
+
+
+def unpack_electrode_states(data, device_hash=None):
+    '''
+    Decode electrode states encoded by :func:`pack_electrode_states`.
+
+    Parameters
+    ----------
+    data : str
+        Encoded electrode states.
+    device_hash : str, optional
+        Expected device hash.
+
+    Returns
+    -------
+    numpy.ndarray
+        ``uint8`` state of every electrode, in device order.
+
+    Raises
+    ------
+    ValueError
+        If ``data`` is not valid, or was encoded for a different device.
+    '''
+    if len(data) < STATE_HEADER.size:
+        raise ValueError('Binary states are truncated.')
+    magic, version, encoding, data_hash, count = \
+        STATE_HEADER.unpack_from(data)
+    if magic != STATE_MAGIC or version != STATE_VERSION:
+        raise ValueError('Unsupported binary states (magic=%r, version=%r).'
+                         % (magic, version))
+    if device_hash is not None and data_hash != device_hash:
+        raise ValueError('Binary states do not match device.')
+    payload = np.frombuffer(data, dtype=np.uint8, offset=STATE_HEADER.size)
+    if encoding == STATE_ENCODINGS['bitmask']:
+        size = (count + 7) // 8
+    elif encoding == STATE_ENCODINGS['uint8']:
+        size = count
+    else:
+        raise ValueError('Unsupported binary state encoding: %r' % encoding)
+    if payload.shape[0] != size:
+        raise ValueError('Expected %d bytes of binary states, got %d.' %
+                         (size, payload.shape[0]))
+    if encoding == STATE_ENCODINGS['bitmask']:
+        return np.unpackbits(payload)[:count]
+    return (payload > 0).astype(np.uint8)
+
+
+class ElectrodeStates(object):
+    '''
+    Compact store of electrode actuation states, ordered by device electrode
+    index.
+
+    Parameters
+    ----------
+    electrode_ids : list-like
+        Electrode identifiers, in device order.
+    values : list-like, optional
+        Initial state of each electrode (default: all off).
+
+    Attributes
+    ----------
+    electrode_ids : numpy.ndarray
+        Electrode identifiers, in device order.
+    index : dict
+        Mapping from electrode identifier to position in
+        :attr:`electrode_ids`.
+    values : numpy.ndarray
+        ``uint8`` array of electrode states (non-zero is actuated).
+    '''
+    def __init__(self, electrode_ids, values=None):
+        self.electrode_ids = np.asarray(electrode_ids)
+        self.index = dict((electrode_id, i)
+                          for i, electrode_id in enumerate(self.electrode_ids))
+        if values is None:
+            self.values = np.zeros(self.electrode_ids.shape[0], dtype=np.uint8)
+        else:
+            self.values = (np.asarray(values) > 0).astype(np.uint8)
+        self._series = None
+        self._device_hash = None
+
+    def __len__(self):
+        return self.values.shape[0]
+
+    def __repr__(self):
+        return ('<ElectrodeStates electrodes=%d actuated=%d>' %
+                (len(self), np.count_nonzero(self.values)))
+
+    def copy(self):
+        return ElectrodeStates(self.electrode_ids, self.values.copy())
+
+    @property
+    def device_hash(self):
+        '''
+        Returns
+        -------
+        str
+            Hash of :attr:`electrode_ids` (see :func:`get_device_hash`).
+        '''
+        if self._device_hash is None:
+            self._device_hash = get_device_hash(self.electrode_ids)
+        return self._device_hash
+
+    def pack(self, encoding='bitmask'):
+        '''
+        Returns
+        -------
+        str
+            States encoded as binary string (see
+            :func:`pack_electrode_states`).
+        '''
+        return pack_electrode_states(self.values, self.device_hash, encoding)
+
+    def unpack(self, data):
+        '''
+        Parameters
+        ----------
+        data : str
+            States of all electrodes encoded by :meth:`pack` (or
+            :func:`pack_electrode_states`) for the same device.
+
+        Returns
+        -------
+        ElectrodeStates
+            Decoded states, sharing :attr:`electrode_ids` with this store.
+
+        Raises
+        ------
+        ValueError
+            If ``data`` is not valid, or was encoded for a different device.
+        '''
+        values = unpack_electrode_states(data, self.device_hash)
+        if values.shape[0] != len(self):
+            raise ValueError('Expected %d electrode states, got %d.' %
+                             (len(self), values.shape[0]))
+        states = ElectrodeStates(self.electrode_ids, values)
+        states._device_hash = self._device_hash
+        return states
+
+    def get(self, electrode_id, default=None):
+        '''
+        Returns
+        -------
+        int
+            State of electrode, or ``default`` if electrode is unknown.
+        '''
+        i = self.index.get(electrode_id)
+        return default if i is None else int(self.values[i])
+
+    def lookup(self, electrode_ids):
+        '''
+        Returns
+        -------
+        numpy.ndarray
+            State of each electrode (``0`` for unknown electrodes).
+        '''
+        index = self.index
+        positions = np.array([index.get(electrode_id, -1)
+                              for electrode_id in electrode_ids], dtype=int)
+        values = np.zeros(positions.shape[0], dtype=np.uint8)
+        known = positions >= 0
+        values[known] = self.values[positions[known]]
+        return values
+
+    def _positions(self, electrode_states):
+        '''
+        Returns
+        -------
+        tuple
+            Positions and (``uint8``) states of known electrodes in
+            ``electrode_states`` (null states are skipped).
+        '''
+        if isinstance(electrode_states, ElectrodeStates):
+            electrode_states = electrode_states.series
+        index = self.index
+        positions = np.array([index.get(electrode_id, -1)
+                              for electrode_id in electrode_states.index],
+                             dtype=int)
+        values = np.asarray(electrode_states.values, dtype=float)
+        known = (positions >= 0) & ~np.isnan(values)
+        return positions[known], (values[known] > 0).astype(np.uint8)
+
+    def update(self, electrode_states):
+        '''
+        Merge states into store (electrodes not in ``electrode_states`` are
+        left unchanged).
+
+        Parameters
+        ----------
+        electrode_states : pandas.Series or ElectrodeStates
+            Electrode states, indexed by electrode identifier.
+
+        Returns
+        -------
+        numpy.ndarray
+            Positions of electrodes with changed states.
+        '''
+        positions, values = self._positions(electrode_states)
+        changed = positions[self.values[positions] != values]
+        self.values[positions] = values
+        return np.unique(changed)
+
+    def _dense(self, electrode_states):
+        '''
+        Returns
+        -------
+        numpy.ndarray
+            State of every electrode in store order (electrodes not in
+            ``electrode_states`` are off).
+        '''
+        if (isinstance(electrode_states, ElectrodeStates) and
+                (electrode_states.electrode_ids is self.electrode_ids)):
+            return electrode_states.values.copy()
+        values = np.zeros_like(self.values)
+        positions, known_values = self._positions(electrode_states)
+        values[positions] = known_values
+        return values
+
+    def set(self, electrode_states):
+        '''
+        Replace all states (electrodes not in ``electrode_states`` are turned
+        off).
+
+        Parameters
+        ----------
+        electrode_states : pandas.Series or ElectrodeStates
+            Electrode states, indexed by electrode identifier.
+
+        Returns
+        -------
+        numpy.ndarray
+            Positions of electrodes with changed states.
+        '''
+        values = self._dense(electrode_states)
+        changed = np.flatnonzero(self.values != values)
+        self.values[:] = values
+        return changed
+
+    def changed(self, other):
+        '''
+        Returns
+        -------
+        numpy.ndarray
+            Positions of electrodes whose states differ from ``other``
+            (electrodes not in ``other`` are considered off).
+        '''
+        if (isinstance(other, ElectrodeStates) and
+                np.array_equal(self.electrode_ids, other.electrode_ids)):
+            return np.flatnonzero(self.values != other.values)
+        return np.flatnonzero(self.values != self._dense(other))
+
+    def equals(self, other):
+        '''
+        Returns
+        -------
+        bool
+            ``True`` if states match ``other`` (electrodes not in ``other``
+            are considered off).
+        '''
+        return not self.changed(other).shape[0]
+
+    def active(self):
+        '''
+        Returns
+        -------
+        numpy.ndarray
+            Identifiers of actuated electrodes.
+        '''
+        return self.electrode_ids[self.values > 0]
+
+    @property
+    def series(self):
+        '''
+        Returns
+        -------
+        pandas.Series
+            States indexed by electrode identifier, sharing memory with
+            :attr:`values` (for backwards compatibility with code expecting
+            a :class:`pandas.Series`).
+        '''
+        if self._series is None:
+            self._series = pd.Series(self.values,
+                                     index=pd.Index(self.electrode_ids,
+                                                    name='electrode_id'),
+                                     name='electrode_states', copy=False)
+        return self._series
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+import threading
+
+import pytest
+
+from dmf_device_ui.decoder import MessageQueue
+
+
+def test_invalid_overflow_policy():
+    with pytest.raises(ValueError):
+        MessageQueue(overflow='drop_newest')
+
+
+def test_drop_oldest():
+    queue = MessageQueue(2, 'drop_oldest')
+    for i in xrange(3):
+        assert queue.put(('routes', i))
+    assert queue.get_all() == [('routes', 1), ('routes', 2)]
+    assert queue.dropped_count == 1
+    assert len(queue) == 0
+
+
+def test_drop_stale():
+    queue = MessageQueue(3, 'drop_stale')
+    queue.put(('electrode_states_set', 0))
+    queue.put(('commands', 1))
+    queue.put(('electrode_states_updated', 2))
+    # New snapshot replaces queued state messages, but not commands.
+    assert queue.put(('electrode_states_packed', 3))
+    assert queue.get_all() == [('commands', 1),
+                               ('electrode_states_packed', 3)]
+    assert queue.dropped_count == 2
+
+
+def test_drop_stale_blocks_without_stale_messages():
+    queue = MessageQueue(1, 'drop_stale')
+    queue.put(('commands', 0))
+    put = threading.Thread(target=queue.put, args=(('routes', 1), ))
+    put.start()
+    put.join(.1)
+    assert put.is_alive()
+    assert queue.get_all() == [('commands', 0)]
+    put.join(5)
+    assert queue.get_all() == [('routes', 1)]
+    assert queue.dropped_count == 0
+
+
+def test_close_wakes_blocked_put():
+    queue = MessageQueue(1, 'block')
+    queue.put(('routes', 0))
+    results = []
+    put = threading.Thread(target=lambda: results.append(queue.put(('routes',
+                                                                     1))))
+    put.start()
+    put.join(.1)
+    assert put.is_alive()
+    queue.close()
+    put.join(5)
+    assert results == [False]
+    assert len(queue) == 0
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pandas as pd
+import pytest
+
+from dmf_device_ui.states import (ElectrodeStates, STATE_HEADER,
+                                  get_device_hash, pack_electrode_states,
+                                  unpack_electrode_states)
+
+
+@pytest.fixture
+def store():
+    return ElectrodeStates(['electrode%03d' % i for i in xrange(10)])
+
+
+@pytest.mark.parametrize('encoding', ['bitmask', 'uint8'])
+def test_pack_unpack_round_trip(store, encoding):
+    store.values[[0, 3, 9]] = 1
+    states = store.unpack(store.pack(encoding))
+    assert states.electrode_ids is store.electrode_ids
+    assert np.array_equal(states.values, store.values)
+
+
+def test_unpack_rejects_other_device(store):
+    other = ElectrodeStates(store.electrode_ids[::-1])
+    with pytest.raises(ValueError):
+        store.unpack(other.pack())
+
+
+def test_unpack_rejects_truncated(store):
+    data = store.pack('uint8')
+    with pytest.raises(ValueError):
+        unpack_electrode_states(data[:STATE_HEADER.size - 1])
+    with pytest.raises(ValueError):
+        unpack_electrode_states(data[:-1], store.device_hash)
+
+
+def test_unpack_rejects_bad_magic(store):
+    data = store.pack()
+    with pytest.raises(ValueError):
+        unpack_electrode_states('XX' + data[2:])
+
+
+def test_pack_rejects_unknown_encoding(store):
+    with pytest.raises(ValueError):
+        pack_electrode_states(store.values, store.device_hash, 'json')
+
+
+def test_unpack_rejects_count_mismatch(store):
+    data = pack_electrode_states(np.ones(len(store) + 1), store.device_hash)
+    with pytest.raises(ValueError):
+        store.unpack(data)
+
+
+def test_device_hash_depends_on_order():
+    assert (get_device_hash(['a', 'b']) != get_device_hash(['b', 'a']))
+
+
+def test_update_returns_changed_positions(store):
+    store.values[2] = 1
+    changed = store.update(pd.Series([1, 1, np.nan, 1],
+                                     index=['electrode002', 'electrode005',
+                                            'electrode006', 'unknown']))
+    assert changed.tolist() == [5]
+    # Electrodes not in update (or with null states) are unchanged.
+    assert store.active().tolist() == ['electrode002', 'electrode005']
+
+
+def test_set_returns_changed_positions(store):
+    store.values[[2, 4]] = 1
+    changed = store.set(pd.Series([1, 1], index=['electrode004',
+                                                 'electrode007']))
+    assert changed.tolist() == [2, 7]
+    # Electrodes not in states are turned off.
+    assert store.active().tolist() == ['electrode004', 'electrode007']
+
+
+def test_series_shares_memory(store):
+    series = store.series
+    store.update(pd.Series([1], index=['electrode001']))
+    assert series['electrode001'] == 1
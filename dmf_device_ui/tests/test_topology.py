@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+import threading
+
+import pandas as pd
+
+from dmf_device_ui.topology import (PathCache, get_neighbours,
+                                    get_predecessors, walk_predecessors)
+
+
+def get_line_neighbours():
+    # a - b - c - d, with isolated electrode e.
+    df_connections = pd.DataFrame([['a', 'b'], ['c', 'b'], ['c', 'd'],
+                                   ['d', 'd']], columns=['source', 'target'])
+    return get_neighbours(df_connections, ['a', 'b', 'c', 'd', 'e'])
+
+
+def test_get_neighbours():
+    neighbours = get_line_neighbours()
+    assert neighbours['b'] == frozenset(['a', 'c'])
+    # Self connections are ignored.
+    assert neighbours['d'] == frozenset(['c'])
+    assert neighbours['e'] == frozenset()
+
+
+def test_get_predecessors():
+    predecessors = get_predecessors(get_line_neighbours(), 'a')
+    assert predecessors == {'a': None, 'b': 'a', 'c': 'b', 'd': 'c'}
+
+
+def test_walk_predecessors():
+    predecessors = get_predecessors(get_line_neighbours(), 'b')
+    assert walk_predecessors(predecessors, 'd') == ['b', 'c', 'd']
+    assert walk_predecessors(predecessors, 'b') == ['b']
+    assert walk_predecessors(predecessors, 'e') is None
+
+
+def test_path_cache_evicts_least_recently_used():
+    cache = PathCache(get_line_neighbours(), max_trees=2, all_pairs_size=0)
+    assert cache.find_path('a', 'd') == ['a', 'b', 'c', 'd']
+    cache.get_tree('b')
+    cache.get_tree('a')
+    cache.get_tree('c')
+    assert cache.misses == 3
+    assert cache.hits == 1
+    # `b` was least recently used.
+    cache.get_tree('b')
+    assert cache.misses == 4
+
+
+def test_path_cache_request_tree():
+    cache = PathCache(get_line_neighbours(), all_pairs_size=0)
+    computed = threading.Event()
+    results = []
+
+    def callback(source, predecessors):
+        results.append((source, predecessors))
+        computed.set()
+
+    assert cache.request_tree('d', callback) is None
+    assert computed.wait(5)
+    assert results == [('d', {'d': None, 'c': 'd', 'b': 'c', 'a': 'b'})]
+    # Cached trees are returned immediately.
+    assert cache.request_tree('d', callback) == results[0][1]
+    assert len(results) == 1
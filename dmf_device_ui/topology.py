@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+'''
+Electrode connectivity look up structures.
+
+.. versionadded:: 0.16
+'''
+from collections import OrderedDict
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def get_neighbours(df_shape_connections, electrode_ids=None):
+    '''
+    Parameters
+    ----------
+    df_shape_connections : pandas.DataFrame
+        Table with one row per electrode connection, with the columns
+        ``source`` and ``target``.
+    electrode_ids : list-like, optional
+        Electrode identifiers to include, even if not connected to any other
+        electrode.
+
+    Returns
+    -------
+    dict
+        Mapping from each electrode identifier to a :class:`frozenset` of
+        identifiers of connected electrodes (connections are undirected).
+    '''
+    neighbours = {}
+    if electrode_ids is not None:
+        for electrode_id in electrode_ids:
+            neighbours[electrode_id] = set()
+    for source, target in zip(df_shape_connections.source.tolist(),
+                              df_shape_connections.target.tolist()):
+        if source == target:
+            continue
+        neighbours.setdefault(source, set()).add(target)
+        neighbours.setdefault(target, set()).add(source)
+    return dict((electrode_id, frozenset(neighbours_i))
+                for electrode_id, neighbours_i in neighbours.iteritems())
+
+
+def get_predecessors(neighbours, source):
+    '''
+    Breadth-first search from ``source``.
+
+    Parameters
+    ----------
+    neighbours : dict
+        Mapping from each electrode identifier to connected electrode
+        identifiers (see :func:`get_neighbours`).
+    source : str
+        Electrode identifier.
+
+    Returns
+    -------
+    dict
+        Mapping from each electrode reachable from ``source`` to its
+        predecessor on a shortest path from ``source`` (``source`` maps to
+        ``None``).
+    '''
+    predecessors = {source: None}
+    frontier = [source]
+    while frontier:
+        next_frontier = []
+        for electrode_id in frontier:
+            for neighbour in neighbours.get(electrode_id, ()):
+                if neighbour not in predecessors:
+                    predecessors[neighbour] = electrode_id
+                    next_frontier.append(neighbour)
+        frontier = next_frontier
+    return predecessors
+
+
+def walk_predecessors(predecessors, target):
+    '''
+    Returns
+    -------
+    list or None
+        Electrode identifiers on path from root of ``predecessors`` tree to
+        ``target``, or ``None`` if ``target`` is not reachable.
+    '''
+    if target not in predecessors:
+        return None
+    path = []
+    electrode_id = target
+    while electrode_id is not None:
+        path.append(electrode_id)
+        electrode_id = predecessors[electrode_id]
+    return path[::-1]
+
+
+class PathCache(object):
+    '''
+    Memoized shortest paths between electrodes.
+
+    Shortest paths are answered by walking a breadth-first predecessor tree
+    for the source electrode.  Trees are computed lazily (at most
+    ``max_trees`` are kept; least recently used trees are evicted first).
+    Trees that are not cached may be computed in a background thread (see
+    :meth:`request_tree`), such that searching a large device does not block
+    the caller.
+
+    For devices with at most ``all_pairs_size`` electrodes, trees for *all*
+    source electrodes are computed in a background thread by :meth:`start`
+    and are never evicted.
+
+    Parameters
+    ----------
+    neighbours : dict
+        Mapping from each electrode identifier to connected electrode
+        identifiers (see :func:`get_neighbours`).
+    max_trees : int, optional
+        Maximum number of predecessor trees to keep for large devices.
+    all_pairs_size : int, optional
+        Maximum number of electrodes for which all trees are precomputed.
+
+    Attributes
+    ----------
+    hits : int
+        Number of path requests answered from a cached tree.
+    misses : int
+        Number of path requests that required a breadth-first search.
+    '''
+    def __init__(self, neighbours, max_trees=64, all_pairs_size=500):
+        self.neighbours = neighbours
+        self.all_pairs = len(neighbours) <= all_pairs_size
+        self.max_trees = len(neighbours) if self.all_pairs else max_trees
+        self.hits = 0
+        self.misses = 0
+        self._trees = OrderedDict()
+        # Callbacks waiting for each tree computed by `request_tree`.
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+        self._thread = None
+
+    def __repr__(self):
+        return ('<PathCache electrodes=%d trees=%d hits=%d misses=%d>' %
+                (len(self.neighbours), len(self._trees), self.hits,
+                 self.misses))
+
+    def start(self):
+        '''
+        Precompute predecessor trees in a background (daemon) thread.
+
+        Returns
+        -------
+        threading.Thread or None
+            Background thread, or ``None`` if the device is too large to
+            precompute all pairs.
+        '''
+        if not self.all_pairs:
+            return None
+        self._thread = threading.Thread(target=self._build)
+        self._thread.daemon = True
+        self._thread.start()
+        return self._thread
+
+    def cancel(self):
+        '''
+        Stop background precomputation (e.g., when device changes).
+
+        Callbacks of pending :meth:`request_tree` calls are not called.
+        '''
+        self._cancelled.set()
+
+    def _build(self):
+        for source in self.neighbours.keys():
+            if self._cancelled.is_set():
+                break
+            with self._lock:
+                if source in self._trees:
+                    continue
+            predecessors = get_predecessors(self.neighbours, source)
+            with self._lock:
+                self._trees[source] = predecessors
+        logger.debug('Computed %d shortest path trees.', len(self._trees))
+
+    def _get_cached_tree(self, source):
+        # Must be called while holding `_lock`.
+        predecessors = self._trees.pop(source, None)
+        if predecessors is not None:
+            self.hits += 1
+            # Move to end (i.e., most recently used).
+            self._trees[source] = predecessors
+        return predecessors
+
+    def _compute_tree(self, source):
+        with self._lock:
+            self.misses += 1
+        predecessors = get_predecessors(self.neighbours, source)
+        with self._lock:
+            self._trees[source] = predecessors
+            while len(self._trees) > self.max_trees:
+                self._trees.popitem(last=False)
+        return predecessors
+
+    def get_tree(self, source):
+        '''
+        Returns
+        -------
+        dict
+            Predecessor tree rooted at ``source`` (see
+            :func:`get_predecessors`).
+        '''
+        with self._lock:
+            predecessors = self._get_cached_tree(source)
+        if predecessors is None:
+            predecessors = self._compute_tree(source)
+        return predecessors
+
+    def request_tree(self, source, callback):
+        '''
+        Get predecessor tree rooted at ``source`` without blocking.
+
+        Parameters
+        ----------
+        source : str
+            Electrode identifier.
+        callback : function
+            Called *from a background thread* as
+            ``callback(source, predecessors)`` once a tree that is not cached
+            has been computed.  Not called if the cache is cancelled (see
+            :meth:`cancel`) before tree is computed.
+
+        Returns
+        -------
+        dict or None
+            Cached predecessor tree rooted at ``source`` (``callback`` is not
+            called), or ``None`` if tree is being computed.
+        '''
+        with self._lock:
+            predecessors = self._get_cached_tree(source)
+            if predecessors is not None:
+                return predecessors
+            elif source in self._pending:
+                # Tree is already being computed.
+                self._pending[source].append(callback)
+                return None
+            self._pending[source] = [callback]
+        thread = threading.Thread(target=self._compute_pending,
+                                  args=(source, ))
+        thread.daemon = True
+        thread.start()
+        return None
+
+    def _compute_pending(self, source):
+        predecessors = self._compute_tree(source)
+        with self._lock:
+            callbacks = self._pending.pop(source)
+        if self._cancelled.is_set():
+            return
+        for callback in callbacks:
+            try:
+                callback(source, predecessors)
+            except Exception:
+                logger.error('Error in shortest path tree callback.',
+                             exc_info=True)
+
+    def find_path(self, source, target):
+        '''
+        Returns
+        -------
+        list or None
+            Electrode identifiers on a shortest path from ``source`` to
+            ``target`` (inclusive), or ``None`` if no path exists.
+        '''
+        return walk_predecessors(self.get_tree(source), target)
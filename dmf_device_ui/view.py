@@ -4,7 +4,6 @@ import logging
 import subprocess as sp
 import sys
 
-from cairo_helpers.surface import flatten_surfaces
 from logging_helpers import _L
 from microdrop_utility.gui import register_shortcuts
 from opencv_helpers.safe_cv import cv2
@@ -22,6 +21,7 @@ import zmq
 
 from .options import DeviceViewInfo, DebugView
 from .plugin import DevicePluginConnection, DevicePlugin
+from .topology import walk_predecessors
 from . import generate_plugin_name
 
 logger = logging.getLogger(__name__)
@@ -30,7 +30,18 @@ logger = logging.getLogger(__name__)
 class DmfDeviceViewBase(SlaveView):
     def __init__(self, device_canvas, hub_uri='tcp://localhost:31000',
                  plugin_name=None, allocation=None, video_transport='tcp',
-                 video_host='*', video_port=None, debug_view=False):
+                 video_host='*', video_port=None, debug_view=False,
+                 decoder_queue_size=0, decoder_overflow='drop_stale',
+                 state_format='json'):
+        '''
+        .. versionchanged:: 0.16
+            Add ``decoder_queue_size``, ``decoder_overflow``, and
+            ``state_format`` arguments.  If ``decoder_queue_size`` is positive,
+            subscription messages are decoded in a background thread (see
+            :meth:`DevicePlugin.start_decoder`).  ``state_format`` requests
+            binary electrode states (see
+            :meth:`DevicePlugin.negotiate_state_format`).
+        '''
         # Video sink socket info.
         self.socket_info = {'transport': video_transport,
                             'host': video_host,
@@ -43,6 +54,9 @@ class DmfDeviceViewBase(SlaveView):
         self._plugin_name = plugin_name or generate_plugin_name()
         self._allocation = allocation
         self._debug_view = debug_view
+        self._decoder_queue_size = decoder_queue_size
+        self._decoder_overflow = decoder_overflow
+        self._state_format = state_format
         self.plugin = None
         self.socket_timeout_id = None
         self.heartbeat_timeout_id = None
@@ -175,6 +189,8 @@ class DmfDeviceViewBase(SlaveView):
             if timeout_id is not None:
                 gobject.source_remove(timeout_id)
         if self.plugin is not None:
+            self.plugin.stop_message_pump()
+            self.plugin.stop_decoder()
             self.plugin = None
         self.cleanup_video()
 
@@ -222,16 +238,16 @@ class DmfDeviceViewBase(SlaveView):
         .. versionchanged:: 0.11.3
             Clear temporary routes by setting ``df_routes`` property of
             :attr:`canvas_slave`.
+
+        .. versionchanged:: 0.16
+            Temporary routes are drawn on a separate canvas layer (cleared by
+            canvas on mouse release), so routes table is left untouched.
         '''
         if self.plugin is None:
             return
-        # XXX Negative `route_i` corresponds to temporary route being
-        # drawn.  Since electrode selection terminates route drawing, clear any
-        # rows corresponding to negative `route_i` values from the routes
-        # table.
-        slave.df_routes = slave.df_routes.loc[slave.df_routes.route_i >=
-                                              0].copy()
-        state = self.canvas_slave.electrode_states.get(data['electrode_id'], 0)
+        state = self.canvas_slave.electrode_state_store.get(data
+                                                            ['electrode_id'],
+                                                            0)
         self.plugin.execute_async('microdrop.electrode_controller_plugin',
                                   'set_electrode_states',
                                   electrode_states=pd
@@ -257,28 +273,57 @@ class DmfDeviceViewBase(SlaveView):
         .. versionchanged:: 0.11.3
             Clear temporary routes by setting ``df_routes`` property of
             :attr:`canvas_slave`.
-        '''
-        import networkx as nx
 
+        .. versionchanged:: 0.16
+            Look up shortest path in canvas path cache (see
+            :attr:`DmfDeviceCanvas.path_cache`), rather than searching device
+            graph on every selection.  If the shortest path tree from the
+            source electrode is not cached, it is computed in a background
+            thread and the route is added once computed (see
+            :meth:`add_shortest_route`).  Temporary routes are drawn on a
+            separate canvas layer (cleared by canvas on mouse release), so
+            routes table is left untouched.
+        '''
         source_id = data['source_id']
         target_id = data['target_id']
 
         if self.canvas_slave.device is None or self.plugin is None:
             return
-        # XXX Negative `route_i` corresponds to temporary route being
-        # drawn.  Since electrode pair selection terminates route drawing,
-        # clear any rows corresponding to negative `route_i` values from the
-        # routes table.
-        slave.df_routes = slave.df_routes.loc[slave.df_routes.route_i >=
-                                              0].copy()
-        try:
-            shortest_path = self.canvas_slave.device.find_path(source_id,
-                                                               target_id)
-            self.plugin.execute_async('droplet_planning_plugin',
-                                      'add_route', drop_route=shortest_path)
-        except nx.NetworkXNoPath:
+
+        def on_tree_computed(source_id, predecessors):
+            # Called from path cache thread; add route on GTK main loop.
+            gobject.idle_add(self.add_shortest_route, source_id, target_id,
+                             predecessors)
+
+        predecessors = (self.canvas_slave.path_cache
+                        .request_tree(source_id, on_tree_computed))
+        if predecessors is not None:
+            self.add_shortest_route(source_id, target_id, predecessors)
+
+    def add_shortest_route(self, source_id, target_id, predecessors):
+        '''
+        Add shortest path between two electrodes to droplet routes.
+
+        Parameters
+        ----------
+        source_id, target_id : str
+            Electrode identifiers.
+        predecessors : dict
+            Shortest path predecessor tree rooted at ``source_id`` (see
+            :meth:`dmf_device_ui.topology.PathCache.request_tree`).
+
+
+        .. versionadded:: 0.16
+        '''
+        shortest_path = walk_predecessors(predecessors, target_id)
+        if shortest_path is None:
             logger.error('No path found between %s and %s.', source_id,
                          target_id)
+        elif self.plugin is not None:
+            self.plugin.execute_async('droplet_planning_plugin',
+                                      'add_route', drop_route=shortest_path)
+        # Remove idle callback (if called through `gobject.idle_add`).
+        return False
 
     def on_canvas_slave__route_selected(self, slave, route):
         logger.debug('Route selected: %s', route)
@@ -293,36 +338,35 @@ class DmfDeviceViewBase(SlaveView):
         .. versionchanged:: 0.11.3
             Update routes table by setting ``df_routes`` property of
             :attr:`canvas_slave`.
+
+        .. versionchanged:: 0.16
+            Temporary route is drawn incrementally by the canvas (see
+            :meth:`DmfDeviceCanvas.extend_temporary_route`), so routes table
+            is left untouched.
         '''
         logger.debug('Route electrode added: %s', electrode_id)
-        if slave._route.electrode_ids is None:
-            return
-        df_route = pd.DataFrame([[-1, e, i] for i, e in
-                                 enumerate(slave._route.electrode_ids)],
-                                columns=['route_i', 'electrode_i',
-                                         'transition_i'])
-        # XXX Negative `route_i` corresponds to temporary route being
-        # drawn.  Append row entries for temporary route to existing routes
-        # table.
-        df_routes = slave.df_routes.loc[slave.df_routes.route_i >= 0].copy()
-        self.canvas_slave.df_routes = pd.concat([df_routes, df_route])
 
     def on_canvas_slave__surfaces_reset(self, slave, df_surfaces):
         logger.debug('[surfaces reset]\n%s', df_surfaces)
         self.layer_alpha_slave.set_surfaces(df_surfaces)
 
     def on_layer_alpha_slave__alpha_changed(self, slave, name, alpha):
+        '''
+        .. versionchanged:: 0.16
+            Re-composite layers without re-rendering layer contents, blending
+            only the modified layer against cached surfaces of the layers
+            below and above it (see
+            :meth:`DmfDeviceCanvas.flatten_alpha_change`).
+        '''
         logger.debug('[alpha changed] %s -> %.2f', name, alpha)
         self.canvas_slave.set_surface_alpha(name, alpha)
-        self.canvas_slave.cairo_surface = flatten_surfaces(self.canvas_slave
-                                                           .df_surfaces)
-        gtk.idle_add(self.canvas_slave.draw)
+        self.canvas_slave.request_redraw(alpha_layer=name)
 
     def on_layer_alpha_slave__layers_reordered(self, slave, rows_index):
         reordered_index = self.canvas_slave.df_surfaces.index[rows_index]
         logger.info('[layers reordered] %s', reordered_index)
         self.canvas_slave.reorder_surfaces(reordered_index)
-        gtk.idle_add(self.canvas_slave.draw)
+        self.canvas_slave.request_redraw()
 
     ###########################################################################
     # ZeroMQ plugin callbacks
@@ -359,12 +403,19 @@ class DmfDeviceViewBase(SlaveView):
 
     def on_plugin_connected(self, plugin):
         self.plugin = plugin
+        # Binary state format is negotiated once device is loaded (see
+        # `DevicePlugin.request_refresh`).
+        self.plugin.requested_state_format = self._state_format
 
         # Block until device is retrieved from device info plugin.
         self.plugin.execute_async('microdrop.device_info_plugin',
                                   'get_device')
-        # Periodically process outstanding plugin socket messages.
-        self.socket_timeout_id = gtk.timeout_add(25, self.plugin.check_sockets)
+        if self._decoder_queue_size > 0:
+            # Decode subscription messages in background thread.
+            self.plugin.start_decoder(self._decoder_queue_size,
+                                      self._decoder_overflow)
+        # Process plugin socket messages as they arrive.
+        self.plugin.start_message_pump()
         # Periodically ping hub to verify connection is alive.
         self.heartbeat_timeout_id = gtk.timeout_add(2000, self.ping_hub)
 
@@ -378,28 +429,33 @@ class DmfDeviceViewBase(SlaveView):
         '''
         .. versionchanged:: 0.12
             Refactor to use :meth:`on_electrode_states_set`.
+
+        .. versionchanged:: 0.16
+            Merge states into canvas electrode state store (see
+            :meth:`ElectrodeStates.update`), rather than combining
+            :class:`pandas.Series` objects.
         '''
-        states['electrode_states'] = \
-            states['electrode_states'].combine_first(self.canvas_slave
-                                                     .electrode_states)
-        self.on_electrode_states_set(states)
+        region = self.canvas_slave.set_electrode_states(states
+                                                        ['electrode_states'],
+                                                        merge=True)
+        if region is not None:
+            self.canvas_slave.request_redraw(region=region)
 
     def on_electrode_states_set(self, states):
         '''
         Render and draw updated **static** electrode actuations layer on
         canvas.
-        '''
-        if (self.canvas_slave.electrode_states
-                .equals(states['electrode_states'])):
-            return
 
-        self.canvas_slave.electrode_states = states['electrode_states']
 
-        surface = self.canvas_slave.render_static_electrode_state_shapes()
-        self.canvas_slave.set_surface('static_electrode_state_shapes', surface)
-        self.canvas_slave.cairo_surface = flatten_surfaces(self.canvas_slave
-                                                           .df_surfaces)
-        gobject.idle_add(self.canvas_slave.draw)
+        .. versionchanged:: 0.16
+            Only repaint and redraw region of canvas covering electrodes with
+            changed states (see
+            :meth:`DmfDeviceCanvas.set_electrode_states`).
+        '''
+        region = self.canvas_slave.set_electrode_states(states
+                                                        ['electrode_states'])
+        if region is not None:
+            self.canvas_slave.request_redraw(region=region)
 
     def on_dynamic_electrode_states_set(self, states):
         '''
@@ -408,15 +464,12 @@ class DmfDeviceViewBase(SlaveView):
 
 
         .. versionadded:: 0.12
-        '''
-        self.canvas_slave._dynamic_electrodes = states
 
-        surface = self.canvas_slave.render_dynamic_electrode_state_shapes()
-        self.canvas_slave.set_surface('dynamic_electrode_state_shapes',
-                                      surface)
-        self.canvas_slave.cairo_surface = flatten_surfaces(self.canvas_slave
-                                                           .df_surfaces)
-        gobject.idle_add(self.canvas_slave.draw)
+        .. versionchanged:: 0.16
+            Invalidate layer; it is rendered and drawn on the next canvas
+            frame (see :meth:`DmfDeviceCanvas.update_layers`).
+        '''
+        self.canvas_slave.dynamic_electrodes = states
 
     ###########################################################################
     # ## Slave signal handling ##
@@ -532,16 +585,6 @@ class DmfDeviceViewBase(SlaveView):
         self.video_info_slave.frames_per_second = frame_rate
         self.video_info_slave.dropped_rate = dropped_rate
 
-    def on_canvas_slave__routes_set(self, slave, df_routes):
-        '''
-        .. versionadded:: 0.11.3
-        '''
-        self.canvas_slave.set_surface('routes',
-                                      self.canvas_slave.render_routes())
-        self.canvas_slave.cairo_surface = flatten_surfaces(self.canvas_slave
-                                                           .df_surfaces)
-        gtk.idle_add(self.canvas_slave.draw)
-
     def on_canvas_slave__point_pair_selected(self, slave, data):
         if any([slave.canvas is None or not self.transform_slave.modify or not
                 slave.enabled]):
@@ -48,7 +48,7 @@ setup(name='dmf-device-ui',
       url='https://github.com/wheeler-microfluidics/dmf-device-ui',
       license='LGPLv2.1',
       install_requires=install_requires,
-      packages=['dmf_device_ui'],
+      packages=['dmf_device_ui', 'dmf_device_ui.tests'],
       # Install data listed in `MANIFEST.in`
       include_package_data=True)
 